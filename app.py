@@ -1,11 +1,93 @@
 import streamlit as st
 import streamlit_mermaid as stmd
 
+import orjson
 import requests
-import time
+from requests.adapters import HTTPAdapter
+from websockets.sync.client import connect
+from websockets.exceptions import ConnectionClosed, WebSocketException
 
 # Backend URL
 BACKEND_URL = "http://localhost:8000"  # Update this if your backend runs on a different URL/port
+WS_URL = BACKEND_URL.replace("http", "ws", 1)
+
+# Close code the backend uses for an unknown analysis id
+WS_NOT_FOUND = 4404
+
+@st.cache_resource
+def get_session():
+    """Shared HTTP session so backend calls reuse keep-alive connections across reruns"""
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+SESSION = get_session()
+
+def watch_status(analysis_id):
+    """Yield status updates pushed over WebSocket, falling back to polling"""
+    # Reported like a failed analysis so callers handle a single terminal shape
+    not_found = {"status": "failed", "error": "Analysis not found"}
+    try:
+        with connect(f"{WS_URL}/analysis/{analysis_id}/ws", open_timeout=5) as ws:
+            for message in ws:
+                status_data = orjson.loads(message)
+                yield status_data
+                if status_data["status"] != "processing":
+                    return
+    except ConnectionClosed as e:
+        if e.rcvd and e.rcvd.code == WS_NOT_FOUND:
+            yield not_found
+            return
+        st.warning(f"Live updates unavailable, falling back to polling: {str(e)}")
+    except (OSError, WebSocketException) as e:
+        st.warning(f"Live updates unavailable, falling back to polling: {str(e)}")
+
+    # Long-poll: the server holds each request until progress moves or 30s pass
+    params = {}
+    while True:
+        status_response = SESSION.get(f"{BACKEND_URL}/analysis/{analysis_id}/status", params=params, timeout=60)
+        if status_response.status_code == 404:
+            yield not_found
+            return
+        # Other errors carry {"detail": ...}, not a status
+        status_response.raise_for_status()
+        status_data = orjson.loads(status_response.content)
+        yield status_data
+        if status_data["status"] != "processing":
+            return
+        params = {"wait": 30, "since_progress": status_data["progress"]}
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_result(analysis_id):
+    """Fetch a completed analysis once; reruns are served from the cache"""
+    result_response = SESSION.get(f"{BACKEND_URL}/analysis/{analysis_id}/result")
+    # Raise instead of caching an error payload
+    result_response.raise_for_status()
+    return orjson.loads(result_response.content)
+
+def render_results(result_data):
+    """Display a completed analysis"""
+    st.subheader("Project Overview")
+    st.write(result_data["project_overview"])
+
+    st.subheader("File Structure")
+    st.json(result_data["file_structure"])
+
+    if include_documentation and result_data.get("file_documentation"):
+        st.subheader("File Documentation")
+        st.json(result_data["file_documentation"])
+
+    if include_diagrams and result_data.get("sequence_diagram"):
+        st.subheader("Sequence Diagram")
+        # st.image(result_data["sequence_diagram"])
+        stmd.st_mermaid(result_data["sequence_diagram"])
+
+    if include_diagrams and result_data.get("class_diagram"):
+        st.subheader("Class Diagram")
+        # st.image(result_data["class_diagram"])
+        stmd.st_mermaid(result_data["class_diagram"])
 
 st.title("Codebase Documentation Maker")
 st.write("Provide a GitHub repository link to generate AI-powered documentation and diagrams.")
@@ -34,49 +116,38 @@ if st.button("Start Analysis"):
         # Send the request to the backend
         st.info("Starting analysis...")
         try:
-            response = requests.post(f"{BACKEND_URL}/analyze", json=data)
+            response = SESSION.post(f"{BACKEND_URL}/analyze", json=data)
             if response.status_code == 200:
-                analysis_id = response.json().get("analysis_id")
+                analysis_id = orjson.loads(response.content).get("analysis_id")
+                st.session_state.pop("completed_analysis_id", None)
                 st.success(f"Analysis started! Analysis ID: {analysis_id}")
 
-                # Poll the backend for analysis status
+                # Follow the analysis status as the backend pushes updates
                 st.info("Checking analysis status...")
-                while True:
-                    status_response = requests.get(f"{BACKEND_URL}/analysis/{analysis_id}/status")
-                    status_data = status_response.json()
-
+                progress_placeholder = st.empty()
+                overview_placeholder = st.empty()
+                for status_data in watch_status(analysis_id):
                     if status_data["status"] == "completed":
                         st.success("Analysis completed successfully!")
-                        result_response = requests.get(f"{BACKEND_URL}/analysis/{analysis_id}/result")
-                        result_data = result_response.json()
-
-                        # Display results
-                        st.subheader("Project Overview")
-                        st.write(result_data["project_overview"])
-
-                        st.subheader("File Structure")
-                        st.json(result_data["file_structure"])
-
-                        if include_documentation:
-                            st.subheader("File Documentation")
-                            st.json(result_data["file_documentation"])
-
-                        if include_diagrams:
-                            st.subheader("Sequence Diagram")
-                            # st.image(result_data["sequence_diagram"])
-                            stmd.st_mermaid(result_data["sequence_diagram"])
-
-                            st.subheader("Class Diagram")
-                            # st.image(result_data["class_diagram"])
-                            stmd.st_mermaid(result_data["class_diagram"])
+                        st.session_state["completed_analysis_id"] = analysis_id
+                        overview_placeholder.empty()
+                        render_results(fetch_result(analysis_id))
                         break
                     elif status_data["status"] == "failed":
                         st.error(f"Analysis failed: {status_data.get('error', 'Unknown error')}")
                         break
                     else:
-                        st.info(f"Progress: {status_data['progress']}% - {status_data['message']}")
-                        time.sleep(5)
+                        progress_placeholder.info(f"Progress: {status_data['progress']}% - {status_data['message']}")
+                        # Render the overview as it streams in from the model
+                        if status_data.get("partial_overview"):
+                            overview_placeholder.markdown(status_data["partial_overview"])
             else:
                 st.error(f"Failed to start analysis: {response.text}")
         except Exception as e:
-            st.error(f"An error occurred: {str(e)}")
\ No newline at end of file
+            st.error(f"An error occurred: {str(e)}")
+elif "completed_analysis_id" in st.session_state:
+    # Widget interactions rerun the script; show the finished analysis without re-polling
+    try:
+        render_results(fetch_result(st.session_state["completed_analysis_id"]))
+    except Exception as e:
+        st.error(f"An error occurred: {str(e)}")
\ No newline at end of file
@@ -1,6 +1,11 @@
-from pydantic import BaseModel, HttpUrl, validator
+from pydantic import BaseModel, ConfigDict, Field, HttpUrl, model_validator
 from typing import Optional, Dict, Any, List, Literal
 from enum import Enum
+from functools import cached_property
+import itertools
+
+# Languages whose files are considered for class diagrams
+OO_LANGUAGES = frozenset({'python', 'java', 'javascript', 'typescript', 'cpp', 'csharp'})
 
 class InputType(str, Enum):
     """Supported input types for codebase analysis"""
@@ -14,34 +19,68 @@ class CodebaseAnalysisRequest(BaseModel):
     include_diagrams: bool = True
     include_documentation: bool = True
     max_files: Optional[int] = 1000
+    # Upper bound on file reads/parses in flight at once
+    max_concurrent: int = Field(32, ge=1)
     
-    @validator('source')
-    def validate_source(cls, v, values):
-        input_type = values.get('input_type')
-        if input_type == InputType.GITHUB_URL:
-            if not (v.startswith('https://github.com/') or v.startswith('https://www.github.com/')):
+    @model_validator(mode='after')
+    def validate_source(self):
+        # Runs after field validation so input_type is available regardless of field order
+        if self.input_type == InputType.GITHUB_URL:
+            if not (self.source.startswith('https://github.com/') or self.source.startswith('https://www.github.com/')):
                 raise ValueError('GitHub URL must start with https://github.com/')
-        elif input_type == InputType.LOCAL_PATH:
-            if not v.strip():
+        elif self.input_type == InputType.LOCAL_PATH:
+            if not self.source.strip():
                 raise ValueError('Local path cannot be empty')
-        return v
+        return self
 
 class FileInfo(BaseModel):
     """Information about a single file"""
+    model_config = ConfigDict(frozen=True)
+    
     path: str
     type: str
     size: int
     lines: int
     language: Optional[str] = None
     documentation: Optional[str] = None
+    # Parsed classes/functions/imports, kept for aggregation but not serialized
+    code_structure: Optional[Dict[str, Any]] = Field(default=None, exclude=True, repr=False)
+
+    def __hash__(self) -> int:
+        # The generated hash covers every field and fails on the code_structure dict;
+        # leaving it out still agrees with equality, which compares all fields
+        return hash((self.path, self.type, self.size, self.lines, self.language, self.documentation))
+
+def _language_key(file_info: FileInfo) -> str:
+    """Grouping key for a file's language"""
+    return file_info.language or 'other'
 
 class ProjectStructure(BaseModel):
     """Project structure representation"""
+    model_config = ConfigDict(frozen=True)
+    
     name: str
     files: List[FileInfo]
     directories: List[str]
     total_files: int
     total_lines: int
+    
+    # Derived views, computed once per structure and not serialized
+    @cached_property
+    def files_by_language(self) -> Dict[str, List[FileInfo]]:
+        """Files grouped by language, in sorted language order"""
+        sorted_files = sorted(self.files, key=_language_key)
+        return {lang: list(group) for lang, group in itertools.groupby(sorted_files, key=_language_key)}
+    
+    @cached_property
+    def documented_files(self) -> List[FileInfo]:
+        """Files that have parsed documentation"""
+        return [f for f in self.files if f.documentation]
+    
+    @cached_property
+    def oo_files(self) -> List[FileInfo]:
+        """Files written in object-oriented languages"""
+        return [f for f in self.files if f.language in OO_LANGUAGES]
 
 class AnalysisResponse(BaseModel):
     """Response model for completed analysis"""
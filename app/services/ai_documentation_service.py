@@ -1,8 +1,17 @@
 import os
-import json
 import re
-from typing import Dict, Any, List
-from groq import Groq
+import time
+import asyncio
+import hashlib
+import inspect
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Awaitable, Callable, Iterator, Optional, Union
+import httpx
+import orjson
+import tiktoken
+from groq import AsyncGroq, DefaultAsyncHttpxClient
+from app.services.llm_cache import LLMCache
 from app.utils.logger import setup_logger
 from dotenv import load_dotenv  # Import dotenv
 
@@ -11,22 +20,202 @@ load_dotenv()
 
 logger = setup_logger(__name__)
 
+# Caps concurrent Groq requests to stay within provider rate limits; shared by every
+# analysis in this process, including calls gathered within one analysis
+GROQ_SEMAPHORE = asyncio.Semaphore(int(os.getenv("GROQ_CONCURRENCY", "8")))
+
+# Attempts the SDK retries 429s and 5xx with exponential backoff (honoring Retry-After);
+# the semaphore stays held meanwhile so retries do not let new calls pile on
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+
+# Idle LLM connections are kept this long; well past the SDK's 5s default so the
+# TLS session survives the gaps between an analysis' LLM calls
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))
+
+# Maximum number of batch documentation results memoized in memory
+PROMPT_MEMO_SIZE = int(os.getenv("PROMPT_MEMO_SIZE", "1024"))
+
+# Receives streamed text; may be a plain function or a coroutine function
+DeltaCallback = Callable[[str], Union[None, Awaitable[None]]]
+
+# Fallbacks used by the generation running in the current context; tasks gathered
+# from it copy the context and so append to the same list
+_fallbacks_used: ContextVar[Optional[List[str]]] = ContextVar("fallbacks_used", default=None)
+
+@contextmanager
+def track_fallbacks() -> Iterator[List[str]]:
+    """Collect the fallbacks used by generation inside the block, e.g. to avoid caching a degraded result"""
+    used: List[str] = []
+    token = _fallbacks_used.set(used)
+    try:
+        yield used
+    finally:
+        _fallbacks_used.reset(token)
+
+def _record_fallback(what: str) -> None:
+    """Note that placeholder output replaced a failed generation"""
+    used = _fallbacks_used.get()
+    if used is not None:
+        used.append(what)
+
+async def _emit(on_delta: DeltaCallback, text: str) -> None:
+    """Pass text to a delta callback, awaiting it when it returns an awaitable"""
+    result = on_delta(text)
+    if inspect.isawaitable(result):
+        await result
+
+# Extracts the body of a ```mermaid ... ``` fence from model output
+MERMAID_RE = re.compile(r"```mermaid\s*([\s\S]*?)```")
+
+# Fallback diagrams used when the model output has no usable Mermaid code
+DEFAULT_SEQUENCE_DIAGRAM = "sequenceDiagram\n    participant User\n    participant System\n    User->>System: Request\n    System-->>User: Response"
+DEFAULT_CLASS_DIAGRAM = "classDiagram\n    class MainClass {\n        +method()\n    }"
+
+def _extract_mermaid(content: Optional[str], keyword: str) -> Optional[str]:
+    """Pull Mermaid code out of model output, accepting fenced or bare diagrams"""
+    if not isinstance(content, str) or not content:
+        return None
+    # Extract content inside ```mermaid ... ```
+    match = MERMAID_RE.search(content)
+    if match:
+        return match.group(1).strip() or None
+    # Bare diagram starting with the expected keyword (e.g. "sequenceDiagram")
+    content = content.strip()
+    return content if content.startswith(keyword) else None
+
+# Upper bound on prompt input tokens, leaving room in the context window for output
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+
+# Seconds to wait before retrying a tokenizer load that failed
+TOKENIZER_RETRY_SECONDS = 60
+
+# Tokenizer used to size prompts; None until ensure_tokenizer() has loaded it
+_encoding = None
+_last_tokenizer_attempt = float("-inf")
+
+def _load_encoding() -> None:
+    """Load the tokenizer; blocking, as tiktoken may download its BPE file"""
+    global _encoding
+    try:
+        # cl100k_base is close enough to the llama tokenizer for budgeting
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # Left unset so a later ensure_tokenizer() tries again
+        logger.warning(f"Tokenizer unavailable, estimating tokens from length: {str(e)}")
+
+async def ensure_tokenizer() -> None:
+    """Load the tokenizer on a worker thread if missing, retrying failures at most once a minute"""
+    global _last_tokenizer_attempt
+    now = time.monotonic()
+    if _encoding is not None or now - _last_tokenizer_attempt < TOKENIZER_RETRY_SECONDS:
+        return
+    _last_tokenizer_attempt = now
+    await asyncio.to_thread(_load_encoding)
+
+def _fit_to_budget(text: str, max_tokens: int) -> str:
+    """Trim text to at most max_tokens tokens; estimates from length until the tokenizer is loaded"""
+    encoding = _encoding
+    if encoding is None:
+        # Roughly 4 characters per token
+        return text[:max_tokens * 4]
+    
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    logger.info(f"Trimmed prompt section from {len(tokens)} to {max_tokens} tokens")
+    return encoding.decode(tokens[:max_tokens])
+
+def create_llm_http_client() -> httpx.AsyncClient:
+    """Pooled HTTP client for LLM API calls, meant to be shared across analyses"""
+    return DefaultAsyncHttpxClient(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=LLM_KEEPALIVE_SECONDS)
+    )
+
 class AIDocumentationService:
     """Service for generating AI-powered documentation and diagrams"""
     
-    def __init__(self):
-        # Fetch GROQ_API_KEY from environment variables
-        self.groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        # Fetch GROQ_API_KEY from environment variables; without an http_client the SDK builds its own
+        self.groq_client = AsyncGroq(
+            api_key=os.getenv("GROQ_API_KEY"),
+            http_client=http_client,
+            max_retries=LLM_MAX_RETRIES
+        )
         # Using GROQ's fastest available model for code analysis
         self.model = "llama-3.3-70b-versatile"
+        # Completions are cached so repeat analyses skip the network call
+        self.llm_cache = LLMCache()
+        # Parsed batch documentation keyed by prompt digest, checked before the LLM cache
+        self._prompt_memo: Dict[str, Dict[str, str]] = {}
     
-    async def generate_documentation(self, codebase_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate comprehensive documentation for the codebase"""
+    async def aclose(self) -> None:
+        """Close the LLM client and its pooled connections"""
+        await self.groq_client.close()
+    
+    async def _cached_chat(self, prompt: str, temperature: float = 0.3, on_delta: Optional[DeltaCallback] = None, response_format: Optional[Dict[str, str]] = None) -> str:
+        """Send a single-message chat completion, serving repeats from the LLM cache.
+        
+        When on_delta is given the completion is streamed and each text chunk is
+        passed to it as it arrives; the joined text is still returned.
+        response_format is forwarded to the API, e.g. {"type": "json_object"}.
+        """
+        cached = await self.llm_cache.get(prompt, self.model, temperature)
+        if cached is not None:
+            logger.info("LLM cache hit")
+            if on_delta:
+                await _emit(on_delta, cached)
+            return cached
+        
+        extra_args = {"response_format": response_format} if response_format else {}
+        async with GROQ_SEMAPHORE:
+            response = await self.groq_client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                stream=on_delta is not None,
+                **extra_args
+            )
+            
+            if on_delta:
+                buf = []
+                usage = None
+                async for chunk in response:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        buf.append(delta)
+                        await _emit(on_delta, delta)
+                    # Groq reports usage on the final chunk of a stream
+                    x_groq = getattr(chunk, "x_groq", None)
+                    if x_groq and getattr(x_groq, "usage", None):
+                        usage = x_groq.usage
+                content = "".join(buf)
+            else:
+                usage = getattr(response, "usage", None)
+                content = ""
+                if response and response.choices and response.choices[0].message.content:
+                    content = response.choices[0].message.content
+        
+        # Log provider-side prompt caching to verify hit rate
+        if usage:
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached_tokens = getattr(details, "cached_tokens", 0) or 0
+            logger.info(f"LLM usage: prompt_tokens={usage.prompt_tokens}, cached_tokens={cached_tokens}")
+        
+        if content:
+            await self.llm_cache.put(prompt, self.model, temperature, content)
+        return content
+    
+    async def generate_documentation(self, codebase_data: Dict[str, Any], on_overview_delta: Optional[DeltaCallback] = None) -> Dict[str, Any]:
+        """Generate comprehensive documentation for the codebase
+        
+        on_overview_delta, if given, receives the project overview text as it streams in.
+        """
         logger.info("Generating AI documentation")
+        await ensure_tokenizer()
         
         try:
             # Generate project overview
-            overview = await self._generate_project_overview(codebase_data)
+            overview = await self._generate_project_overview(codebase_data, on_overview_delta)
             
             # Generate file-specific documentation
             file_docs = await self._generate_file_documentation(codebase_data)
@@ -40,15 +229,13 @@ class AIDocumentationService:
             logger.error(f"Error generating documentation: {str(e)}")
             raise
     
-    async def _generate_project_overview(self, codebase_data: Dict[str, Any]) -> str:
+    async def _generate_project_overview(self, codebase_data: Dict[str, Any], on_delta: Optional[DeltaCallback] = None) -> str:
         """Generate high-level project overview using actual code analysis"""
         structure = codebase_data['structure']
         technologies = codebase_data['technologies']
         code_analysis = codebase_data.get('code_analysis', {})
         
-        # Extract actual code documentation from files
-        documented_files = [f for f in structure.files if f.documentation]
-        code_summaries = "\n".join([f.documentation for f in documented_files[:10]])
+        file_structure, code_summaries = self._overview_sections(structure)
         
         prompt = f"""
         Analyze this codebase and provide a comprehensive project overview based on actual code content:
@@ -64,7 +251,7 @@ class AIDocumentationService:
         - Total Imports: {code_analysis.get('total_imports', 0)}
         
         File Structure & Code Content:
-        {self._format_file_structure_with_code(structure, documented_files)}
+        {file_structure}
         
         Actual Code Structure Analysis:
         {code_summaries}
@@ -80,50 +267,75 @@ class AIDocumentationService:
         Format your response as a well-structured markdown document.
         """
         
-        response = self.groq_client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3
-        )
+        overview = await self._cached_chat(prompt, on_delta=on_delta)
+        if not overview.strip():
+            _record_fallback("project overview")
+        return overview
+    
+    def _overview_sections(self, structure, max_tokens: int = PROMPT_TOKEN_BUDGET) -> tuple:
+        """Build the file structure and code summary prompt sections within a token budget"""
+        # Extract actual code documentation from files
+        documented_files = structure.documented_files
+        code_summaries = "\n".join([f.documentation for f in documented_files[:10]])
         
-        return response.choices[0].message.content or ""
+        # Keep the variable-size sections within the prompt token budget
+        file_structure = _fit_to_budget(self._format_file_structure_with_code(structure), max_tokens // 2)
+        code_summaries = _fit_to_budget(code_summaries, max_tokens // 4)
+        return file_structure, code_summaries
+    
+    def _format_file_structure_with_code(self, structure) -> str:
+        """Format file structure including actual code content"""
+        # Add directories, limited to prevent token overflow
+        lines = ["📁 %s/" % directory for directory in structure.directories[:15]]
+        
+        # Add files with actual code content
+        for lang, lang_files in structure.files_by_language.items():
+            lines.append("\n%s files:" % lang.upper())
+            for f in lang_files[:8]:  # Reduced limit to prevent token overflow
+                lines.append("  📄 %s (%d lines)" % (f.path, f.lines))
+                if f.documentation:
+                    # Show actual code structure
+                    lines.append("    %s..." % f.documentation[:200])
+        
+        return "\n".join(lines)
     
     async def _generate_file_documentation(self, codebase_data: Dict[str, Any]) -> Dict[str, str]:
         """Generate documentation for individual files using actual code content"""
         structure = codebase_data['structure']
-        file_docs = {}
         
         # First, use pre-parsed documentation for files that have it
-        for file_info in structure.files:
-            if file_info.documentation:
-                file_docs[file_info.path] = file_info.documentation
+        file_docs = {f.path: f.documentation for f in structure.documented_files}
         
-        # For files without documentation, generate basic summaries
-        undocumented_files = [f for f in structure.files if not f.documentation and f.language != 'unknown']
-        
-        # Group undocumented files by language for batch processing
+        # For files without documentation, generate basic summaries, grouped by language for batch processing
         files_by_language = {}
-        for file_info in undocumented_files:
-            if file_info.language not in files_by_language:
-                files_by_language[file_info.language] = []
-            files_by_language[file_info.language].append(file_info)
-        
-        # Generate documentation for undocumented files
-        for language, files in files_by_language.items():
-            # Process files in batches of 10
-            for i in range(0, len(files), 10):
-                batch = files[i:i+10]
-                batch_docs = await self._generate_batch_documentation(batch, language)
-                file_docs.update(batch_docs)
+        for language, files in structure.files_by_language.items():
+            if language == 'unknown':
+                continue
+            undocumented_files = [f for f in files if not f.documentation]
+            if undocumented_files:
+                files_by_language[language] = undocumented_files
+        
+        # Generate documentation for undocumented files, in batches of 10, concurrently
+        tasks = [
+            self._generate_batch_documentation(files[i:i+10], language)
+            for language, files in files_by_language.items()
+            for i in range(0, len(files), 10)
+        ]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        # One failed batch (e.g. a 429) shouldn't discard the others
+        for batch_docs in results:
+            if isinstance(batch_docs, Exception):
+                logger.warning(f"Error generating batch documentation: {str(batch_docs)}")
+                _record_fallback("file documentation")
+                continue
+            file_docs.update(batch_docs)
         
         return file_docs
     
     async def _generate_batch_documentation(self, files: List, language: str) -> Dict[str, str]:
         """Generate documentation for a batch of files"""
-        file_list = "\n".join([
-            f"- {f.path} ({f.lines} lines, {f.size} bytes)"
-            for f in files
-        ])
+        file_list = "\n".join("- %s (%d lines, %d bytes)" % (f.path, f.lines, f.size) for f in files)
         
         prompt = f"""
         Generate concise documentation for these {language} files:
@@ -142,20 +354,37 @@ class AIDocumentationService:
         }}
         """
         
+        # Identical batches within this process are answered from memory
+        memo_key = hashlib.blake2b(prompt.encode(), digest_size=16).hexdigest()
+        if memo_key in self._prompt_memo:
+            return self._prompt_memo[memo_key]
+        
+        # JSON mode makes the server guarantee a parseable object
+        json_mode = {"type": "json_object"}
         try:
-            response = self.groq_client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
-            )
+            content = await self._cached_chat(prompt, response_format=json_mode) or "{}"
+            try:
+                result = orjson.loads(content)
+            except orjson.JSONDecodeError:
+                # Drop the unusable completion and retry once deterministically
+                logger.warning("Batch documentation was not valid JSON, retrying at temperature 0")
+                await self.llm_cache.discard(prompt, self.model, 0.3)
+                content = await self._cached_chat(prompt, temperature=0, response_format=json_mode) or "{}"
+                result = orjson.loads(content)
             
-            content = response.choices[0].message.content or "{}"
-            result = json.loads(content)
+            # Evict the oldest entry once the memo is full
+            if len(self._prompt_memo) >= PROMPT_MEMO_SIZE:
+                self._prompt_memo.pop(next(iter(self._prompt_memo)))
+            self._prompt_memo[memo_key] = result
             return result
             
         except Exception as e:
             logger.warning(f"Error generating batch documentation: {str(e)}")
+            # Don't keep serving a completion that could not be parsed
+            await self.llm_cache.discard(prompt, self.model, 0.3)
+            await self.llm_cache.discard(prompt, self.model, 0)
             # Return empty documentation for files in this batch
+            _record_fallback("file documentation")
             return {f.path: "Documentation generation failed" for f in files}
     
     async def generate_sequence_diagram(self, codebase_data: Dict[str, Any]) -> str:
@@ -183,44 +412,27 @@ class AIDocumentationService:
         """
         
         try:
-            response = self.groq_client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
-            )
-
-            if response.choices[0].message.content:
-                content = response.choices[0].message.content
-                # Extract content inside ```mermaid ... ```
-                match = re.search(r"```mermaid\s*([\s\S]*?)```", content)
-                if match:
-                    mermaid_code = match.group(1).strip()
-                    # print(mermaid_code)
-            
-            return mermaid_code or "sequenceDiagram\n    participant User\n    participant System\n    User->>System: Request\n    System-->>User: Response"
+            content = await self._cached_chat(prompt)
+            diagram = _extract_mermaid(content, "sequenceDiagram")
             
         except Exception as e:
             logger.error(f"Error generating sequence diagram: {str(e)}")
-            return "sequenceDiagram\n    participant User\n    participant System\n    User->>System: Request\n    System-->>User: Response"
+            diagram = None
+        
+        if not diagram:
+            _record_fallback("sequence diagram")
+        return diagram or DEFAULT_SEQUENCE_DIAGRAM
     
     async def generate_class_diagram(self, codebase_data: Dict[str, Any]) -> str:
         """Generate class diagram using actual parsed code structure"""
         logger.info("Generating class diagram")
+        await ensure_tokenizer()
         
         structure = codebase_data['structure']
         technologies = codebase_data['technologies']
         code_analysis = codebase_data.get('code_analysis', {})
         
-        # Focus on object-oriented languages with actual code structure
-        oo_files = [f for f in structure.files if f.language in ['python', 'java', 'javascript', 'typescript', 'cpp', 'csharp'] and f.documentation]
-        
-        # Extract actual class information from documented files
-        actual_classes = []
-        for file_info in oo_files:
-            if 'Classes' in file_info.documentation:
-                actual_classes.append(f"From {file_info.path}: {file_info.documentation}")
-        
-        classes_info = "\n".join(actual_classes[:10])  # Limit to prevent token overflow
+        oo_files, classes_info = self._class_sections(structure)
         
         prompt = f"""
         Based on ACTUAL PARSED CODE STRUCTURE, create a class diagram that shows the main classes and their relationships:
@@ -244,77 +456,117 @@ class AIDocumentationService:
         """
         
         try:
-            response = self.groq_client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
-            )
-
-            # Initialize mermaid_code with a default value
-            mermaid_code = "classDiagram\n    class MainClass {\n        +method()\n    }"
-
-            # Check if the response contains valid content
-            if response and response.choices and response.choices[0].message.content:
-                content = response.choices[0].message.content
-                # Extract content inside ```mermaid ... ```
-                match = re.search(r"```mermaid\s*([\s\S]*?)```", content)
-                if match:
-                    mermaid_code = match.group(1).strip()
-
-            return mermaid_code
+            content = await self._cached_chat(prompt)
+            diagram = _extract_mermaid(content, "classDiagram")
 
         except Exception as e:
             logger.error(f"Error generating class diagram: {str(e)}")
-            # Return default class diagram in case of an error
-            return "classDiagram\n    class MainClass {\n        +method()\n    }"
+            diagram = None
+        
+        # Return default class diagram in case of an error
+        if not diagram:
+            _record_fallback("class diagram")
+        return diagram or DEFAULT_CLASS_DIAGRAM
     
-    def _format_file_structure(self, structure) -> str:
-        """Format file structure for AI prompt"""
-        lines = []
-        
-        # Add directories
-        for directory in structure.directories[:20]:  # Limit to first 20
-            lines.append(f"📁 {directory}/")
-        
-        # Add files grouped by language
-        files_by_lang = {}
-        for file_info in structure.files:
-            lang = file_info.language or 'other'
-            if lang not in files_by_lang:
-                files_by_lang[lang] = []
-            files_by_lang[lang].append(file_info)
-        
-        for lang, files in files_by_lang.items():
-            lines.append(f"\n{lang.upper()} files:")
-            for file_info in files[:10]:  # Limit files per language
-                lines.append(f"  📄 {file_info.path} ({file_info.lines} lines)")
+    def _class_sections(self, structure, max_tokens: int = PROMPT_TOKEN_BUDGET // 2) -> tuple:
+        """Collect object-oriented files and the class structure prompt section"""
+        # Focus on object-oriented languages with actual code structure
+        oo_files = [f for f in structure.oo_files if f.documentation]
         
-        return "\n".join(lines)
+        # Extract actual class information from documented files
+        actual_classes = []
+        for file_info in oo_files:
+            if 'Classes' in file_info.documentation:
+                actual_classes.append(f"From {file_info.path}: {file_info.documentation}")
+        
+        classes_info = "\n".join(actual_classes[:10])  # Limit to prevent token overflow
+        return oo_files, _fit_to_budget(classes_info, max_tokens)
     
-    def _format_file_structure_with_code(self, structure, documented_files) -> str:
-        """Format file structure including actual code content"""
-        lines = []
+    async def generate_all(self, codebase_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate documentation and both diagrams, sharing one LLM call for the project-level artifacts"""
+        logger.info("Generating AI documentation and diagrams")
+        await ensure_tokenizer()
+        
+        # File documentation is independent of the combined call, so run them side by side
+        combined, file_docs = await asyncio.gather(
+            self._generate_combined_artifacts(codebase_data),
+            self._generate_file_documentation(codebase_data)
+        )
         
-        # Add directories
-        for directory in structure.directories[:15]:  # Limit to prevent token overflow
-            lines.append(f"📁 {directory}/")
+        # Fall back to dedicated requests for anything the combined call didn't produce
+        overview = combined.get("overview")
+        if not isinstance(overview, str) or not overview.strip():
+            overview = await self._generate_project_overview(codebase_data)
+        sequence_diagram = _extract_mermaid(combined.get("sequence_diagram"), "sequenceDiagram")
+        if not sequence_diagram:
+            sequence_diagram = await self.generate_sequence_diagram(codebase_data)
+        class_diagram = _extract_mermaid(combined.get("class_diagram"), "classDiagram")
+        if not class_diagram:
+            class_diagram = await self.generate_class_diagram(codebase_data)
+        
+        return {
+            "overview": overview,
+            "files": file_docs,
+            "sequence_diagram": sequence_diagram,
+            "class_diagram": class_diagram
+        }
+    
+    async def _generate_combined_artifacts(self, codebase_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate project overview, sequence diagram and class diagram in a single JSON request"""
+        structure = codebase_data['structure']
+        technologies = codebase_data['technologies']
+        code_analysis = codebase_data.get('code_analysis', {})
         
-        # Add files with actual code content
-        files_by_lang = {}
-        for file_info in structure.files:
-            lang = file_info.language or 'other'
-            if lang not in files_by_lang:
-                files_by_lang[lang] = []
-            files_by_lang[lang].append(file_info)
-        
-        for lang, files in files_by_lang.items():
-            lines.append(f"\n{lang.upper()} files:")
-            for file_info in files[:8]:  # Reduced limit to prevent token overflow
-                if file_info in documented_files and file_info.documentation:
-                    # Show actual code structure
-                    lines.append(f"  📄 {file_info.path} ({file_info.lines} lines)")
-                    lines.append(f"    {file_info.documentation[:200]}...")
-                else:
-                    lines.append(f"  📄 {file_info.path} ({file_info.lines} lines)")
+        # Split the budget across all sections since they share one prompt
+        file_structure, code_summaries = self._overview_sections(structure, PROMPT_TOKEN_BUDGET * 3 // 4)
+        oo_files, classes_info = self._class_sections(structure, PROMPT_TOKEN_BUDGET // 8)
         
-        return "\n".join(lines)
\ No newline at end of file
+        prompt = f"""
+        Analyze this codebase based on actual code content:
+        
+        Project: {structure.name}
+        Total Files: {structure.total_files}
+        Total Lines of Code: {structure.total_lines}
+        Technologies: {', '.join(technologies)}
+        Key Files: {', '.join([f.path for f in structure.files[:20]])}
+        
+        Code Analysis Summary:
+        - Total Classes: {code_analysis.get('total_classes', 0)}
+        - Total Functions: {code_analysis.get('total_functions', 0)}
+        - Total Imports: {code_analysis.get('total_imports', 0)}
+        - Object-Oriented Files: {len(oo_files)}
+        
+        File Structure & Code Content:
+        {file_structure}
+        
+        Actual Code Structure Analysis:
+        {code_summaries}
+        
+        ACTUAL CLASS STRUCTURE (parsed from code):
+        {classes_info}
+        
+        Produce three artifacts:
+        1. "overview": a well-structured markdown project overview covering project purpose and functionality,
+           architecture, key components and their roles, technology stack, development patterns used,
+           and main data flow and interactions
+        2. "sequence_diagram": a Mermaid sequence diagram of the main application flow (user interactions,
+           key system components, data flow, external service calls), starting with: sequenceDiagram
+        3. "class_diagram": a Mermaid class diagram of the actual classes found in the code, their
+           relationships, key methods and inheritance, starting with: classDiagram
+        
+        Return your response as JSON in this format:
+        {{
+            "overview": "markdown...",
+            "sequence_diagram": "sequenceDiagram...",
+            "class_diagram": "classDiagram..."
+        }}
+        """
+        
+        try:
+            content = await self._cached_chat(prompt, response_format={"type": "json_object"})
+            result = orjson.loads(content or "{}")
+            return result if isinstance(result, dict) else {}
+        except Exception as e:
+            logger.warning(f"Error generating combined artifacts: {str(e)}")
+            await self.llm_cache.discard(prompt, self.model, 0.3)
+            return {}
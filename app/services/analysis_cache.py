@@ -0,0 +1,68 @@
+import os
+import hashlib
+from typing import Optional
+import orjson
+from app.models.request_models import CodebaseAnalysisRequest
+from app.utils.compression import compress_json, decompress_json
+from app.utils.logger import setup_logger
+from app.utils.sqlite_cache import SQLiteTTLCache
+
+logger = setup_logger(__name__)
+
+# Default time-to-live for cached analyses (30 days)
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60
+
+# Request fields that only tune how an analysis runs, not what it produces
+NON_OUTPUT_FIELDS = {"max_concurrent"}
+
+def analysis_cache_key(request: CodebaseAnalysisRequest, revision: str) -> str:
+    """Hash the source revision and the canonical form of every output-affecting option"""
+    canonical = orjson.dumps(
+        request.model_dump(mode="json", exclude=NON_OUTPUT_FIELDS),
+        option=orjson.OPT_SORT_KEYS
+    )
+    return hashlib.blake2b(canonical + b"@" + revision.encode(), digest_size=32).hexdigest()
+
+class AnalysisCache(SQLiteTTLCache):
+    """Content-addressed store of completed analyses backed by SQLite"""
+
+    def __init__(self, db_path: Optional[str] = None, ttl_seconds: Optional[int] = None):
+        super().__init__(
+            db_path or os.getenv("ANALYSIS_CACHE_PATH", ".analysis_cache.sqlite3"),
+            "analysis_results",
+            ttl_seconds or int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+            "Analysis cache"
+        )
+
+class RedisAnalysisCache:
+    """Content-addressed store of completed analyses shared through Redis"""
+
+    def __init__(self, url: str, ttl_seconds: Optional[int] = None):
+        # Imported here so redis is only needed when a Redis URL is configured
+        import redis.asyncio as redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds or int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+
+    async def get(self, cache_key: str) -> Optional[str]:
+        """Return the serialized analysis response, or None on miss"""
+        try:
+            raw = await self.redis.get(f"result:{cache_key}")
+        except Exception as e:
+            logger.warning(f"Analysis cache read failed: {str(e)}")
+            return None
+        return decompress_json(raw).decode() if raw else None
+
+    async def put(self, cache_key: str, response: str) -> None:
+        """Store a serialized analysis response"""
+        try:
+            await self.redis.set(f"result:{cache_key}", compress_json(response.encode()), ex=self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Analysis cache write failed: {str(e)}")
+
+def create_analysis_cache():
+    """Share the cache through Redis when REDIS_URL is set, otherwise use local SQLite"""
+    url = os.getenv("REDIS_URL")
+    if url:
+        return RedisAnalysisCache(url)
+    return AnalysisCache()
@@ -0,0 +1,313 @@
+import os
+import time
+import asyncio
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set
+import orjson
+from app.models.request_models import AnalysisResponse
+from app.utils.compression import compress_json, decompress_json
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Default lifetime of an analysis' status and result (1 day)
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+# Default number of analyses kept in process memory before the oldest are dropped
+DEFAULT_MAX_ANALYSES = 1000
+
+# Longest a progress update waits to be written with the ones that follow it
+PROGRESS_FLUSH_SECONDS = float(os.getenv("PROGRESS_FLUSH_SECONDS", "0.1"))
+
+class StatusSubscription:
+    """Wakes a single subscriber whenever an analysis' status changes"""
+
+    def __init__(self):
+        # One pending wakeup is enough: subscribers re-read the latest status anyway
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+    def notify(self) -> None:
+        """Signal a change, coalescing with any wakeup not yet consumed"""
+        if not self._queue.full():
+            self._queue.put_nowait(None)
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait for the next change; returns False if the timeout elapsed first"""
+        try:
+            await asyncio.wait_for(self._queue.get(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+# Merges status fields and optionally stores the result, but only while the status
+# hash still exists, so an evicted or expired analysis is never half-recreated.
+# KEYS: status hash, result key. ARGV: ttl, events channel, has result, result, field/value pairs
+_UPDATE_STATUS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+if ARGV[3] == '1' then
+    redis.call('SET', KEYS[2], ARGV[4], 'EX', ARGV[1])
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 5))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('PUBLISH', ARGV[2], '1')
+return 1
+"""
+
+class AnalysisStore(ABC):
+    """Storage for analysis status and results.
+
+    Status is a small dict (status, progress, message, timestamps, ...) kept
+    separate from the full AnalysisResponse so status reads stay cheap.
+    Status updates are pushed to subscribers, so nobody needs to poll.
+    Updates for analyses the store no longer holds are ignored.
+    """
+
+    @abstractmethod
+    def subscribe(self, analysis_id: str) -> AsyncIterator[Any]:
+        """Async context manager yielding an object whose wait(timeout) wakes on status updates"""
+
+    @abstractmethod
+    async def get_status(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """Return the status dict, or None for unknown analyses"""
+
+    @abstractmethod
+    async def set_status(self, analysis_id: str, status: Dict[str, Any]) -> None:
+        """Create or replace the status dict"""
+
+    @abstractmethod
+    async def update_status(self, analysis_id: str, **fields: Any) -> None:
+        """Merge fields into an existing status and wake subscribers"""
+
+    @abstractmethod
+    async def get_result(self, analysis_id: str) -> Optional[AnalysisResponse]:
+        """Return the completed analysis, or None if there is none"""
+
+    @abstractmethod
+    async def complete(self, analysis_id: str, result: AnalysisResponse, **fields: Any) -> None:
+        """Store the result and merge the final status fields as one step, so no reader sees one without the other"""
+
+class MemoryAnalysisStore(AnalysisStore):
+    """In-process store for analysis status and results.
+
+    Analyses are forgotten ttl_seconds after they start, and the oldest are
+    dropped once more than max_analyses are held, so memory stays bounded.
+    """
+
+    def __init__(self, max_analyses: Optional[int] = None, ttl_seconds: Optional[int] = None):
+        self.max_analyses = max_analyses or int(os.getenv("ANALYSIS_MAX_ENTRIES", DEFAULT_MAX_ANALYSES))
+        self.ttl_seconds = ttl_seconds or int(os.getenv("ANALYSIS_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+        # Ordered by start time, which is also expiry order since every entry shares one TTL
+        self._statuses: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._expires_at: Dict[str, float] = {}
+        self._results: Dict[str, AnalysisResponse] = {}
+        self._subscribers: Dict[str, Set[StatusSubscription]] = {}
+
+    def _evict(self) -> None:
+        """Drop expired analyses, then the oldest ones beyond the size cap"""
+        now = time.monotonic()
+        while self._statuses:
+            oldest = next(iter(self._statuses))
+            if self._expires_at[oldest] > now and len(self._statuses) <= self.max_analyses:
+                break
+            del self._statuses[oldest]
+            del self._expires_at[oldest]
+            self._results.pop(oldest, None)
+
+    @asynccontextmanager
+    async def subscribe(self, analysis_id: str) -> AsyncIterator[StatusSubscription]:
+        """Receive a wakeup for every status update; enter before reading the status"""
+        subscription = StatusSubscription()
+        self._subscribers.setdefault(analysis_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscribers = self._subscribers.get(analysis_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[analysis_id]
+
+    async def get_status(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """Return the status dict, or None for unknown analyses"""
+        self._evict()
+        return self._statuses.get(analysis_id)
+
+    async def set_status(self, analysis_id: str, status: Dict[str, Any]) -> None:
+        """Replace the status dict"""
+        self._statuses[analysis_id] = status
+        self._statuses.move_to_end(analysis_id)
+        self._expires_at[analysis_id] = time.monotonic() + self.ttl_seconds
+        self._evict()
+
+    async def update_status(self, analysis_id: str, **fields: Any) -> None:
+        """Merge fields into the status dict and wake subscribers"""
+        status = self._statuses.get(analysis_id)
+        if status is None:
+            # Already evicted; there is nobody left to report to
+            return
+        status.update(fields)
+        for subscription in self._subscribers.get(analysis_id, ()):
+            subscription.notify()
+
+    async def get_result(self, analysis_id: str) -> Optional[AnalysisResponse]:
+        """Return the completed analysis, or None if there is none"""
+        self._evict()
+        return self._results.get(analysis_id)
+
+    async def complete(self, analysis_id: str, result: AnalysisResponse, **fields: Any) -> None:
+        """Store the result and merge the final status fields as one step, so no reader sees one without the other"""
+        if analysis_id not in self._statuses:
+            return
+        self._results[analysis_id] = result
+        await self.update_status(analysis_id, **fields)
+
+class RedisAnalysisStore(AnalysisStore):
+    """Redis-backed store shared by every worker process.
+
+    Status lives in a hash at analysis:{id}:status (one orjson-encoded value per
+    field, so updates never read-modify-write) and the result as zstd-compressed
+    JSON at analysis:{id}:result; both expire after ttl_seconds. Updates are announced
+    on the analysis:{id}:events pub/sub channel so subscribers on any worker wake.
+    """
+
+    def __init__(self, url: str, ttl_seconds: Optional[int] = None):
+        # Imported here so redis is only needed when a Redis URL is configured
+        import redis.asyncio as redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds or int(os.getenv("ANALYSIS_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+        self._update_script = self.redis.register_script(_UPDATE_STATUS_SCRIPT)
+
+    @staticmethod
+    def _status_key(analysis_id: str) -> str:
+        return f"analysis:{analysis_id}:status"
+
+    @staticmethod
+    def _result_key(analysis_id: str) -> str:
+        return f"analysis:{analysis_id}:result"
+
+    @staticmethod
+    def _events_channel(analysis_id: str) -> str:
+        return f"analysis:{analysis_id}:events"
+
+    @asynccontextmanager
+    async def subscribe(self, analysis_id: str) -> AsyncIterator["RedisStatusSubscription"]:
+        """Receive a wakeup for every status update; enter before reading the status"""
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(self._events_channel(analysis_id))
+        try:
+            yield RedisStatusSubscription(pubsub)
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+
+    async def get_status(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """Return the status dict, or None for unknown analyses"""
+        fields = await self.redis.hgetall(self._status_key(analysis_id))
+        if not fields:
+            return None
+        return {field.decode(): orjson.loads(value) for field, value in fields.items()}
+
+    async def set_status(self, analysis_id: str, status: Dict[str, Any]) -> None:
+        """Replace the status hash atomically"""
+        key = self._status_key(analysis_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping={field: orjson.dumps(value) for field, value in status.items()})
+            pipe.expire(key, self.ttl_seconds)
+            await pipe.execute()
+
+    async def _update(self, analysis_id: str, result: Optional[bytes], fields: Dict[str, Any]) -> None:
+        """Run the guarded update script: one atomic round trip that skips unknown analyses"""
+        args = [self.ttl_seconds, self._events_channel(analysis_id), b"1" if result is not None else b"0", result or b""]
+        for field, value in fields.items():
+            args += [field, orjson.dumps(value)]
+        await self._update_script(keys=[self._status_key(analysis_id), self._result_key(analysis_id)], args=args)
+
+    async def update_status(self, analysis_id: str, **fields: Any) -> None:
+        """Merge fields into the status hash, if it still exists, and announce the change"""
+        await self._update(analysis_id, None, fields)
+
+    async def get_result(self, analysis_id: str) -> Optional[AnalysisResponse]:
+        """Return the completed analysis, or None if there is none"""
+        raw = await self.redis.get(self._result_key(analysis_id))
+        return AnalysisResponse.model_validate_json(decompress_json(raw)) if raw else None
+
+    async def complete(self, analysis_id: str, result: AnalysisResponse, **fields: Any) -> None:
+        """Store the result and merge the final status fields atomically, then announce it"""
+        await self._update(analysis_id, compress_json(result.model_dump_json().encode()), fields)
+
+class RedisStatusSubscription:
+    """Status change wakeups delivered over Redis pub/sub"""
+
+    def __init__(self, pubsub):
+        self._pubsub = pubsub
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait for the next change; returns False if the timeout elapsed first"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (remaining := deadline - loop.time()) > 0:
+            message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+            if message is not None:
+                return True
+        return False
+
+class CoalescingStatusWriter:
+    """Batches one analysis' progress updates into at most one store write per interval.
+
+    Fields passed to update() accumulate, later values winning, and are written
+    together once the interval elapses. A value may be a zero-argument callable,
+    evaluated only when its batch is written, for fields that are costly to build.
+    Call flush() before writing a terminal status so it cannot be overtaken by a
+    batch still pending or in flight.
+    """
+
+    def __init__(self, store: AnalysisStore, analysis_id: str, interval: float = PROGRESS_FLUSH_SECONDS):
+        self._store = store
+        self._analysis_id = analysis_id
+        self._interval = interval
+        self._pending: Dict[str, Any] = {}
+        self._scheduled = False
+        self._task: Optional[asyncio.Task] = None
+        # Serializes writes so batches reach the store in order
+        self._lock = asyncio.Lock()
+
+    def update(self, **fields: Any) -> None:
+        """Queue fields for the next batch, scheduling a write if none is due"""
+        self._pending.update(fields)
+        if not self._scheduled:
+            self._scheduled = True
+            asyncio.get_running_loop().call_later(self._interval, self._flush_soon)
+
+    def _flush_soon(self) -> None:
+        self._scheduled = False
+        # Keep a reference so the task cannot be garbage-collected mid-write
+        self._task = asyncio.create_task(self._flush_in_background())
+
+    async def _flush_in_background(self) -> None:
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"Progress update for analysis {self._analysis_id} failed: {str(e)}")
+
+    async def flush(self) -> None:
+        """Write any queued fields now, after a batch already in flight"""
+        async with self._lock:
+            if not self._pending:
+                return
+            fields, self._pending = self._pending, {}
+            fields = {field: value() if callable(value) else value for field, value in fields.items()}
+            await self._store.update_status(self._analysis_id, **fields)
+
+def create_analysis_store() -> AnalysisStore:
+    """Use Redis when REDIS_URL is set, otherwise keep analyses in process memory"""
+    url = os.getenv("REDIS_URL")
+    if url:
+        logger.info("Storing analyses in Redis")
+        return RedisAnalysisStore(url)
+    return MemoryAnalysisStore()
@@ -1,29 +1,323 @@
 import os
-import subprocess
-import git
+import sys
+import re
+import signal
+import hashlib
+import itertools
+from collections import OrderedDict
+import tarfile
 import tempfile
 import shutil
-from pathlib import Path
-from typing import Dict, Any, List, Optional
+import requests
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 import tree_sitter_python as tspython
 import tree_sitter_javascript as tsjavascript
-from tree_sitter import Language, Parser, Node
+from tree_sitter import Language, Parser, Node, Query, QueryCursor, Tree
 import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from app.models.request_models import InputType, FileInfo, ProjectStructure, CodebaseAnalysisRequest
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Below this size a plain read beats reading into a reusable buffer
+SMALL_FILE_SIZE = 64 * 1024
+
+# Per-thread scratch buffers for counting lines in larger files
+_line_buffers = threading.local()
+
+# Files read per worker-thread hop; amortizes executor overhead over many small files
+READ_CHUNK_SIZE = 32
+
+# Candidates pulled from the directory walk per window when max_files is unset
+SCAN_BATCH_SIZE = 1024
+
+# Matches https://github.com/OWNER/REPO with an optional .git suffix or trailing slash
+GITHUB_REPO_RE = re.compile(r'^https://(?:www\.)?github\.com/([^/]+)/([^/#?]+?)(?:\.git)?/?$')
+
+async def _run_git(*args: str, timeout: Optional[float] = None) -> Tuple[int, bytes, bytes]:
+    """Run a non-interactive git command; returns (returncode, stdout, stderr)"""
+    process = await asyncio.create_subprocess_exec(
+        "git", *args,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        # Fail instead of prompting for credentials on the server's terminal
+        env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
+        # Own process group, so helpers like git-remote-https can be killed with it
+        start_new_session=sys.platform != "win32"
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        # Don't leave git or its helpers running once nobody is waiting for them
+        try:
+            if sys.platform == "win32":
+                process.kill()
+            else:
+                os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await process.wait()
+        raise
+    return process.returncode, stdout, stderr
+
+async def get_source_revision(request: CodebaseAnalysisRequest) -> Optional[str]:
+    """Resolve the commit SHA a GitHub source would be analyzed at, without cloning"""
+    if request.input_type != InputType.GITHUB_URL:
+        # Local directories have no stable revision to key on
+        return None
+    
+    try:
+        returncode, stdout, stderr = await _run_git("ls-remote", request.source, "HEAD", timeout=30)
+    except (OSError, asyncio.TimeoutError) as e:
+        logger.warning(f"Could not resolve revision for {request.source}: {str(e) or 'timed out'}")
+        return None
+    
+    if returncode != 0 or not stdout:
+        logger.warning(f"Could not resolve revision for {request.source}: {stderr.decode(errors='ignore').strip()}")
+        return None
+    return stdout.decode().split()[0]
+
+def _is_within(real_path: str, bases: Tuple[str, ...]) -> bool:
+    """Check whether a resolved path equals or lies under any of the base directories"""
+    for base in bases:
+        if real_path == base or real_path.startswith(base.rstrip(os.sep) + os.sep):
+            return True
+    return False
+
+# tree-sitter languages and precompiled queries, shared by all analyzers
+PYTHON_LANGUAGE = Language(tspython.language())
+JAVASCRIPT_LANGUAGE = Language(tsjavascript.language())
+
+# Node matching runs inside tree-sitter rather than in a Python tree walk
+PYTHON_QUERY = Query(PYTHON_LANGUAGE, """
+    (class_definition name: (identifier) @class.name)
+    (class_definition body: (block (function_definition name: (identifier) @method.name)))
+    (class_definition body: (block (decorated_definition definition: (function_definition name: (identifier) @method.name))))
+    (module (function_definition name: (identifier) @function.name))
+    (module (decorated_definition definition: (function_definition name: (identifier) @function.name)))
+    (import_statement) @import
+    (import_from_statement) @import
+""")
+JAVASCRIPT_QUERY = Query(JAVASCRIPT_LANGUAGE, """
+    (class_declaration name: (identifier) @class.name)
+    (class_declaration body: (class_body (method_definition name: (_) @method.name)))
+    (function_declaration name: (identifier) @function.name)
+    (import_statement) @import
+""")
+
+# Parsers are not thread-safe, so each worker thread builds its own
+_parsers = threading.local()
+
+def _get_parser(language: str) -> Parser:
+    """Return the calling thread's parser for a language"""
+    parser = getattr(_parsers, language, None)
+    if parser is None:
+        parser = Parser(PYTHON_LANGUAGE if language == 'python' else JAVASCRIPT_LANGUAGE)
+        setattr(_parsers, language, parser)
+    return parser
+
+def _in_order(nodes: Optional[List[Node]]) -> List[Node]:
+    """Sort captured nodes into source order"""
+    return sorted(nodes or [], key=lambda node: node.start_byte)
+
+def _node_text(node: Optional[Node]) -> Optional[str]:
+    """Extract text from a tree-sitter node"""
+    if not node:
+        return None
+    return node.text.decode('utf-8', errors='replace')
+
+def _group_methods(captures: Dict[str, List[Node]]) -> List[Dict[str, Any]]:
+    """Build the class list, attaching each captured method to its owning class"""
+    classes = {}
+    for name_node in _in_order(captures.get('class.name')):
+        classes[name_node.parent.id] = {'name': _node_text(name_node), 'methods': []}
+    
+    # Attach each method to the nearest enclosing class (past any decorator wrapper)
+    for name_node in _in_order(captures.get('method.name')):
+        node = name_node.parent
+        while node is not None and node.id not in classes:
+            node = node.parent
+        if node is not None:
+            classes[node.id]['methods'].append(_node_text(name_node))
+    
+    return list(classes.values())
+
+def _import_texts(captures: Dict[str, List[Node]]) -> List[str]:
+    """Collect import statements as stripped source text"""
+    return [_node_text(node).strip() for node in _in_order(captures.get('import'))]
+
+def _common_prefix_length(a: bytes, b: bytes) -> int:
+    """Length of the shared prefix, found by bisection so comparisons stay in C"""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[:mid] == b[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+def _point_at(content: bytes, offset: int) -> Tuple[int, int]:
+    """(row, column) of a byte offset"""
+    row = content.count(b'\n', 0, offset)
+    return row, offset - (content.rfind(b'\n', 0, offset) + 1)
+
+class TreeCache:
+    """LRU cache of parsed trees keyed by file path, for incremental re-parsing"""
+
+    def __init__(self, max_entries: int = 100):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, Tuple[bytes, bytes, Tree, Tuple[Dict[str, Any], str]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> Optional[Tuple[bytes, bytes, Tree, Tuple[Dict[str, Any], str]]]:
+        """Remove and return an entry, so only one worker edits its tree at a time"""
+        with self._lock:
+            return self._entries.pop(key, None)
+
+    def put(self, key: str, digest: bytes, content: bytes, tree: Tree, result: Tuple[Dict[str, Any], str]) -> None:
+        """Store a parse, evicting the least recently used entries beyond the cap"""
+        with self._lock:
+            self._entries[key] = (digest, content, tree, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+def _parse_tree(content: bytes, language: str, cached: Optional[Tuple[bytes, bytes, Tree, Tuple[Dict[str, Any], str]]]) -> Tree:
+    """Parse content, reusing a previous tree of the same file when one is available"""
+    parser = _get_parser(language)
+    if cached is None:
+        return parser.parse(content)
+    
+    # Describe the change as one edit spanning the differing middle section
+    _, old_content, old_tree, _ = cached
+    start = _common_prefix_length(old_content, content)
+    suffix = _common_prefix_length(old_content[start:][::-1], content[start:][::-1])
+    old_end, new_end = len(old_content) - suffix, len(content) - suffix
+    old_tree.edit(
+        start_byte=start,
+        old_end_byte=old_end,
+        new_end_byte=new_end,
+        start_point=_point_at(content, start),
+        old_end_point=_point_at(old_content, old_end),
+        new_end_point=_point_at(content, new_end)
+    )
+    return parser.parse(content, old_tree)
+
+def _parse_python(tree: Tree) -> Dict[str, Any]:
+    """Extract Python code structure from a parsed tree"""
+    captures = QueryCursor(PYTHON_QUERY).captures(tree.root_node)
+    
+    return {
+        'classes': _group_methods(captures),
+        # The query only matches module-level functions, so methods and nested functions are excluded
+        'functions': [_node_text(node) for node in _in_order(captures.get('function.name'))],
+        'imports': _import_texts(captures)
+    }
+
+def _parse_javascript(tree: Tree) -> Dict[str, Any]:
+    """Extract JavaScript code structure from a parsed tree"""
+    captures = QueryCursor(JAVASCRIPT_QUERY).captures(tree.root_node)
+    
+    return {
+        'classes': _group_methods(captures),
+        'functions': [_node_text(node) for node in _in_order(captures.get('function.name'))],
+        'imports': _import_texts(captures)
+    }
+
+_EXTRACTORS = {
+    'python': _parse_python,
+    'javascript': _parse_javascript
+}
+
+def _file_summary(code_info: Dict[str, Any], file_path: str, language: str) -> str:
+    """Generate a summary of the parsed code structure"""
+    summary_parts = [f"{language.title()} file: {file_path}"]
+    
+    if code_info.get('classes'):
+        summary_parts.append(f"Classes ({len(code_info['classes'])}): {', '.join([c['name'] for c in code_info['classes']])}")
+    
+    if code_info.get('functions'):
+        summary_parts.append(f"Functions ({len(code_info['functions'])}): {', '.join(code_info['functions'][:10])}{'...' if len(code_info['functions']) > 10 else ''}")
+    
+    if code_info.get('imports'):
+        summary_parts.append(f"Imports ({len(code_info['imports'])}): {'; '.join(code_info['imports'][:5])}{'...' if len(code_info['imports']) > 5 else ''}")
+    
+    return " | ".join(summary_parts)
+
+def _parse_source(content: bytes, language: str, file_path: str, tree_cache: Optional[TreeCache] = None) -> Optional[Tuple[Dict[str, Any], str]]:
+    """Parse raw source bytes and summarize them in the same worker call.
+    
+    Parses incrementally when the tree cache holds an earlier version of the file.
+    Returns (code_info, summary), or None if the language has no parser or parsing fails.
+    """
+    extract = _EXTRACTORS.get(language)
+    if extract is None:
+        return None
+    
+    try:
+        if tree_cache is None:
+            code_info = extract(_get_parser(language).parse(content))
+            return code_info, _file_summary(code_info, file_path, language)
+        
+        key = f"{language}:{file_path}"
+        digest = hashlib.blake2b(content, digest_size=16).digest()
+        cached = tree_cache.take(key)
+        
+        # Unchanged content: reuse the previous result outright
+        if cached is not None and cached[0] == digest:
+            tree_cache.put(key, *cached)
+            return cached[3]
+        
+        tree = _parse_tree(content, language, cached)
+        code_info = extract(tree)
+        result = (code_info, _file_summary(code_info, file_path, language))
+        tree_cache.put(key, digest, content, tree, result)
+        return result
+    except Exception as e:
+        logger.warning(f"Error parsing {language} code: {str(e)}")
+        return None
+
 class CodebaseAnalyzer:
     """Service for analyzing codebases from various sources"""
     
     def __init__(self):
-        # Initialize tree-sitter parsers for different languages
-        self.python_language = Language(tspython.language())
-        self.javascript_language = Language(tsjavascript.language())
-        
-        self.python_parser = Parser(self.python_language)
-        self.js_parser = Parser(self.javascript_language)
+        # Worker pool for per-file stat/read work, kept off the event loop
+        self._file_pool = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4))
+        
+        # CPU-bound tree-sitter parsing gets its own pool, one worker per core
+        self._parse_pool = ThreadPoolExecutor(max_workers=os.cpu_count())
+        
+        # Recent parse trees, so re-analyzing a changed file parses incrementally
+        self._tree_cache = TreeCache(int(os.getenv("TREE_CACHE_SIZE", 100)))
+        
+        # Languages with a tree-sitter parser; other files only need a line count
+        self._parseable_langs = frozenset({'python', 'javascript'})
+        
+        # Directories that are never worth descending into
+        self._skip_dirs = frozenset({
+            'node_modules', '__pycache__', 'venv', 'env', 'build', 'dist',
+            'target', '.git', '.svn', '.hg', '.vscode', '.idea',
+            '.mypy_cache', '.pytest_cache'
+        })
+        
+        # Allowed base directories, resolved once to prevent symlink bypasses
+        self._allowed_bases = tuple(os.path.realpath(p) for p in (
+            '/workspace',             # Replit workspace
+            '/home',                  # User home directories
+            '/tmp',                   # Temporary directory
+            './',                     # Current working directory
+            '/private/var/folders'    # macOS temporary folders
+        ))
+        
+        # Forbidden system directories, resolved once
+        self._forbidden_bases = tuple(os.path.realpath(p) for p in (
+            '/etc', '/proc', '/sys', '/dev', '/root', '/usr/bin',
+            '/usr/sbin', '/sbin', '/bin', '/var/log', '/boot'
+        ))
         
         # File extensions to language mapping
         self.language_map = {
@@ -62,14 +356,28 @@ class CodebaseAnalyzer:
             '.txt': 'text'
         }
         
+        # Intern language names so every FileInfo shares one string object per language
+        self.language_map = {ext: sys.intern(language) for ext, language in self.language_map.items()}
+        
         # Common binary file extensions to ignore
-        self.binary_extensions = {
+        self.binary_extensions = frozenset({
             '.exe', '.dll', '.so', '.dylib', '.a', '.lib',
             '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.ico', '.svg',
             '.mp3', '.mp4', '.avi', '.mov', '.wav', '.pdf',
             '.zip', '.tar', '.gz', '.rar', '.7z',
             '.pyc', '.pyo', '.class', '.o', '.obj'
-        }
+        })
+        
+        # Single dispatch table: extension -> (is_binary, language, is_parseable)
+        self._ext_table = {ext: (True, None, False) for ext in self.binary_extensions}
+        for ext, language in self.language_map.items():
+            self._ext_table[ext] = (False, language, language in self._parseable_langs)
+        self._unknown_ext = (False, sys.intern('unknown'), False)
+    
+    def close(self) -> None:
+        """Shut down the worker thread pools"""
+        self._file_pool.shutdown(wait=False, cancel_futures=True)
+        self._parse_pool.shutdown(wait=False, cancel_futures=True)
     
     async def analyze_codebase(self, request: CodebaseAnalysisRequest) -> Dict[str, Any]:
         """Main method to analyze a codebase with request parameters"""
@@ -86,17 +394,78 @@ class CodebaseAnalyzer:
             logger.error(f"Error analyzing codebase: {str(e)}")
             raise
     
+    def _download_github_archive(self, source: str, temp_dir: str) -> bool:
+        """Stream the GitHub tarball of HEAD into temp_dir; returns False if unavailable"""
+        match = GITHUB_REPO_RE.match(source)
+        if not match:
+            return False
+        
+        owner, repo = match.groups()
+        url = f"https://codeload.github.com/{owner}/{repo}/tar.gz/HEAD"
+        real_temp_dir = os.path.realpath(temp_dir)
+        try:
+            with requests.get(url, stream=True, timeout=60) as response:
+                if response.status_code != 200:
+                    logger.info(f"Archive not available for {source} (HTTP {response.status_code})")
+                    return False
+                
+                with tarfile.open(fileobj=response.raw, mode='r|gz') as archive:
+                    for member in archive:
+                        # Only regular files; links could point outside the tree
+                        if not member.isfile():
+                            continue
+                        
+                        # Files over 1MB are never analyzed, so don't write them
+                        if member.size > 1024 * 1024:
+                            continue
+                        
+                        # Drop the "<repo>-<sha>/" prefix so the layout matches a clone
+                        relative_path = member.name.partition('/')[2]
+                        if not relative_path:
+                            continue
+                        
+                        # Guard against tar-slip: the target must stay inside temp_dir
+                        target = os.path.realpath(os.path.join(real_temp_dir, relative_path))
+                        if os.path.commonpath([real_temp_dir, target]) != real_temp_dir:
+                            logger.warning(f"Skipping archive member outside target directory: {member.name}")
+                            continue
+                        
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        with archive.extractfile(member) as src, open(target, 'wb') as dst:
+                            shutil.copyfileobj(src, dst)
+        except (requests.RequestException, tarfile.TarError, OSError) as e:
+            logger.warning(f"Archive download failed for {source}: {str(e)}")
+            # Clear any partial extraction before falling back to git
+            for entry in os.scandir(temp_dir):
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.remove(entry.path)
+            return False
+        
+        return True
+    
+    async def _clone_github_repo(self, source: str, temp_dir: str) -> None:
+        """Shallow, blobless, single-branch clone of a repository into temp_dir"""
+        returncode, _, stderr = await _run_git(
+            "clone", "--depth", "1", "--filter=blob:none", "--single-branch", source, temp_dir
+        )
+        if returncode != 0:
+            raise RuntimeError(f"git clone failed: {stderr.decode(errors='ignore').strip()}")
+    
     async def _analyze_github_repo(self, request: CodebaseAnalysisRequest) -> Dict[str, Any]:
         """Analyze a GitHub repository"""
         # Create temporary directory for cloning
         temp_dir = tempfile.mkdtemp()
         
         try:
-            logger.info(f"Cloning repository: {request.source}")
-            # Clone the repository
-            # repo = git.Repo.clone_from(request.source, temp_dir)
-            subprocess.run(["git", "clone", "--depth", "1", request.source, temp_dir], check=True)
-            logger.info(f"Repository cloned to {temp_dir}")
+            # Prefer the GitHub archive, which skips git history and metadata entirely
+            logger.info(f"Fetching repository: {request.source}")
+            if await asyncio.to_thread(self._download_github_archive, request.source, temp_dir):
+                logger.info(f"Repository archive extracted to {temp_dir}")
+            else:
+                await self._clone_github_repo(request.source, temp_dir)
+                logger.info(f"Repository cloned to {temp_dir}")
             
             # Analyze the cloned repository
             result = await self._analyze_directory(temp_dir, request)
@@ -121,55 +490,14 @@ class CodebaseAnalyzer:
         except (OSError, ValueError) as e:
             raise ValueError(f"Cannot resolve path '{path}': {str(e)}")
         
-        # Define allowed base directories with real paths to prevent symlink bypasses
-        allowed_base_dirs = [
-            os.path.realpath('/workspace'),  # Replit workspace
-            os.path.realpath('/home'),       # User home directories
-            os.path.realpath('/tmp'),        # Temporary directory
-            os.path.realpath('./'),          # Current working directory
-            os.path.realpath('/private/var/folders')  # macOS temporary folders
-        ]
-        
-        # Validate path using proper path comparison (not string matching)
-        path_allowed = False
-        for base_dir in allowed_base_dirs:
-            try:
-                # Use commonpath to check if real_path is within base_dir
-                common = os.path.commonpath([real_path, base_dir])
-                if common == base_dir:
-                    path_allowed = True
-                    break
-            except ValueError:
-                # Paths are on different drives (Windows) or other path errors
-                continue
-        
-        if not path_allowed:
+        # Validate path against allowed base directories (prefix check on real paths)
+        if not _is_within(real_path, self._allowed_bases):
             raise ValueError(f"Access denied: Path '{path}' (resolves to '{real_path}') is not within allowed directories")
         
-        # Define forbidden directories with real paths
-        forbidden_dirs = [
-            os.path.realpath('/etc'),
-            os.path.realpath('/proc'),
-            os.path.realpath('/sys'),
-            os.path.realpath('/dev'),
-            os.path.realpath('/root'),
-            os.path.realpath('/usr/bin'),
-            os.path.realpath('/usr/sbin'),
-            os.path.realpath('/sbin'),
-            os.path.realpath('/bin'),
-            os.path.realpath('/var/log'),
-            os.path.realpath('/boot')
-        ]
-        
         # Check if the real path is within any forbidden directory
-        for forbidden_dir in forbidden_dirs:
-            try:
-                common = os.path.commonpath([real_path, forbidden_dir])
-                if common == forbidden_dir:
-                    raise ValueError(f"Access denied: Cannot analyze system directory '{forbidden_dir}'")
-            except ValueError:
-                # Different drives or path errors - safe to continue
-                continue
+        for forbidden_dir in self._forbidden_bases:
+            if _is_within(real_path, (forbidden_dir,)):
+                raise ValueError(f"Access denied: Cannot analyze system directory '{forbidden_dir}'")
         
         return real_path
 
@@ -194,92 +522,139 @@ class CodebaseAnalyzer:
         
         return result
     
-    async def _analyze_directory(self, directory_path: str, request: CodebaseAnalysisRequest) -> Dict[str, Any]:
-        """Analyze directory structure and files with comprehensive security validation"""
-        files = []
-        directories = []
-        total_lines = 0
-        technologies = set()
-        file_count = 0
-        
-        # Walk through directory with security validation for every path
-        for root, dirs, filenames in os.walk(directory_path, followlinks=False):  # Don't follow symlinks
-            # Validate the current root directory
+    def _iter_candidates(self, directory_path: str, directories: List[str]) -> Iterator[Tuple[str, str, os.stat_result, str, str, bool]]:
+        """Lazily walk a directory tree with os.scandir, applying ignore, size and security rules.
+        
+        Yields (file_path, relative_path, stat, extension, language, parseable) candidates in
+        os.walk top-down order. Each listed directory's subdirectories are appended to
+        directories as the walk reaches them, so stopping early leaves the rest unlisted.
+        """
+        # Validate the root once; entries below it are reached without following
+        # symlinks, so their real paths stay under the validated root
+        try:
+            self._validate_path_security(directory_path)
+        except ValueError as e:
+            logger.warning(f"Skipping directory due to security violation: {directory_path} - {e}")
+            return
+        
+        # Explicit stack instead of recursion, so deep trees cannot exhaust the call stack;
+        # relative paths are rel_prefix + name, so relpath is never needed per entry
+        stack = [(directory_path, '')]
+        while stack:
+            root, rel_prefix = stack.pop()
             try:
-                validated_root = self._validate_path_security(root)
-            except ValueError as e:
-                logger.warning(f"Skipping directory due to security violation: {root} - {e}")
-                dirs.clear()  # Don't descend into this directory
+                with os.scandir(root) as it:
+                    entries = list(it)
+            except OSError as e:
+                logger.warning(f"Cannot list directory {root}: {e}")
                 continue
             
-            # Filter directories with security validation
             safe_dirs = []
-            for d in dirs:
-                dir_path = os.path.join(root, d)
-                
-                # Skip hidden directories and common build/cache directories
-                if d.startswith('.') or d in {
-                    'node_modules', '__pycache__', 'venv', 'env', 'build', 'dist',
-                    'target', '.git', '.svn', '.hg', '.vscode', '.idea'
-                }:
+            file_entries = []
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
                     continue
                 
-                # Skip symbolic links to prevent symlink attacks
-                if os.path.islink(dir_path):
-                    logger.debug(f"Skipping symlink directory: {dir_path}")
+                if is_dir:
+                    # Skip hidden directories and common build/cache directories
+                    if entry.name[:1] == '.' or entry.name in self._skip_dirs:
+                        continue
+                    
+                    safe_dirs.append((entry.path, rel_prefix + entry.name))
                     continue
                 
-                # Validate directory path security
-                try:
-                    self._validate_path_security(dir_path)
-                    safe_dirs.append(d)
-                    relative_dir = os.path.relpath(dir_path, directory_path)
-                    directories.append(relative_dir)
-                except ValueError as e:
-                    logger.warning(f"Skipping directory due to security violation: {dir_path} - {e}")
+                # Skip hidden files and common ignore patterns
+                if entry.name[:1] == '.' or entry.name.endswith('.log'):
                     continue
+                file_entries.append(entry)
             
-            # Update the dirs list to only include safe directories
-            dirs[:] = safe_dirs
+            # Like os.walk, a directory's subdirectories are recorded before its files are visited
+            directories.extend(rel_dir for _, rel_dir in safe_dirs)
             
-            # Analyze files with security validation
-            for filename in filenames:
-                # Check max_files limit
-                if request.max_files and file_count >= request.max_files:
-                    logger.info(f"Reached max_files limit of {request.max_files}")
-                    break
-                    
-                file_path = os.path.join(root, filename)
-                
-                # Skip hidden files and common ignore patterns
-                if filename.startswith('.') or filename.endswith('.log'):
+            for entry in file_entries:
+                # Classify by name alone with one table lookup, skipping binaries before any other check
+                stem, dot, suffix = entry.name.rpartition('.')
+                file_extension = sys.intern('.' + suffix.lower()) if dot and stem and suffix else ''
+                is_binary, language, parseable = self._ext_table.get(file_extension, self._unknown_ext)
+                if is_binary:
                     continue
                 
                 # Skip symbolic links to prevent symlink attacks
-                if os.path.islink(file_path):
-                    logger.debug(f"Skipping symlink file: {file_path}")
+                # (directory symlinks are already excluded by is_dir(follow_symlinks=False))
+                if entry.is_symlink():
+                    logger.debug(f"Skipping symlink file: {entry.path}")
                     continue
                 
-                # Validate file path security
                 try:
-                    self._validate_path_security(file_path)
-                except ValueError as e:
-                    logger.warning(f"Skipping file due to security violation: {file_path} - {e}")
+                    # Served from the directory listing where the OS provides it
+                    file_stat = entry.stat(follow_symlinks=False)
+                except OSError:
                     continue
                 
-                relative_path = os.path.relpath(file_path, directory_path)
+                # Skip very large files (> 1MB)
+                if file_stat.st_size > 1024 * 1024:
+                    continue
                 
-                file_info = await self._analyze_file(file_path, relative_path, request.include_documentation)
-                if file_info:
-                    files.append(file_info)
-                    total_lines += file_info.lines
-                    file_count += 1
-                    
-                    if file_info.language:
-                        technologies.add(file_info.language)
+                yield entry.path, rel_prefix + entry.name, file_stat, file_extension, language, parseable
+            
+            # Pushed in reverse so the first subdirectory is walked next, as in os.walk
+            stack.extend((dir_path, rel_dir + os.sep) for dir_path, rel_dir in reversed(safe_dirs))
+    
+    async def _analyze_directory(self, directory_path: str, request: CodebaseAnalysisRequest) -> Dict[str, Any]:
+        """Analyze directory structure and files with comprehensive security validation"""
+        files = []
+        total_lines = 0
+        technologies = set()
+        
+        # The walk is lazy: candidates are pulled a window at a time, so it stops once max_files are read
+        directories = []
+        candidates = self._iter_candidates(directory_path, directories)
+        
+        # Bound in-flight file work so huge trees don't flood the pools or the FD table
+        semaphore = asyncio.Semaphore(request.max_concurrent)
+        loop = asyncio.get_running_loop()
+        
+        async def read_chunk(chunk):
+            async with semaphore:
+                return await loop.run_in_executor(self._file_pool, self._read_files, chunk, request.include_documentation)
+        
+        async def analyze(*args):
+            async with semaphore:
+                return await self._analyze_file(*args)
+        
+        # Analyze files in parallel, a window at a time so we stop once max_files is reached
+        while True:
+            window = request.max_files - len(files) if request.max_files else SCAN_BATCH_SIZE
+            # Walking and stat-ing block, so the next window is pulled in a worker thread
+            batch = await asyncio.to_thread(list, itertools.islice(candidates, window))
+            if not batch:
+                break
             
-            # Break outer loop if max_files reached
-            if request.max_files and file_count >= request.max_files:
+            # Read in chunks so each worker-thread hop covers many small files
+            chunks = [batch[i:i + READ_CHUNK_SIZE] for i in range(0, len(batch), READ_CHUNK_SIZE)]
+            reads = await asyncio.gather(*(read_chunk(chunk) for chunk in chunks))
+            
+            # Parse whatever needs it on the parse pool, keeping walk order
+            results = await asyncio.gather(*(
+                analyze(relative_path, file_stat, file_extension, language, *read)
+                for chunk, chunk_reads in zip(chunks, reads)
+                for (_, relative_path, file_stat, file_extension, language, _), read in zip(chunk, chunk_reads)
+                if read is not None
+            ))
+            
+            for file_info in results:
+                if not file_info:
+                    continue
+                files.append(file_info)
+                total_lines += file_info.lines
+                
+                if file_info.language:
+                    technologies.add(file_info.language)
+            
+            if request.max_files and len(files) >= request.max_files:
+                logger.info(f"Reached max_files limit of {request.max_files}")
                 break
         
         # Determine project name
@@ -301,202 +676,126 @@ class CodebaseAnalyzer:
             'technologies': sorted(list(technologies)),
             'total_files': len(files),
             'total_lines': total_lines,
-            'code_analysis': await self._extract_code_structure(files)
+            'code_analysis': self._extract_code_structure(files)
         }
     
-    async def _analyze_file(self, file_path: str, relative_path: str, include_documentation: bool = True) -> FileInfo | None:
-        """Analyze a single file with code parsing"""
+    def _read_file(self, file_path: str, file_stat: os.stat_result) -> Optional[bytes]:
+        """Read a candidate file's raw bytes; runs on the file pool"""
+        # Read raw bytes in one call; the size is already known from the scan
         try:
-            file_extension = Path(file_path).suffix.lower()
-            
-            # Skip binary files
-            if file_extension in self.binary_extensions:
-                return None
-            
-            # Get file stats
-            file_stat = os.stat(file_path)
-            file_size = file_stat.st_size
-            
-            # Skip very large files (> 1MB)
-            if file_size > 1024 * 1024:
-                return None
-            
-            # Determine language
-            language = self.language_map.get(file_extension, 'unknown')
-            
-            # Read file content
-            content = ""
-            lines = 0
+            fd = os.open(file_path, os.O_RDONLY)
             try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                    lines = content.count('\n') + 1
-            except Exception:
-                # If we can't read as text, skip this file
-                return None
+                content = os.read(fd, file_stat.st_size)
+            finally:
+                os.close(fd)
+        except OSError:
+            # If we can't read the file, skip it
+            return None
+        
+        return content
+    
+    def _read_files(self, batch: List[Tuple[str, str, os.stat_result, str, str, bool]], include_documentation: bool) -> List[Optional[Tuple[int, Optional[bytes]]]]:
+        """Read a chunk of candidate files; runs on the file pool.
+        
+        Returns (lines, content) per file, or None if unreadable. Content is only
+        kept for files that will be parsed; the rest only need a line count.
+        """
+        results = []
+        for file_path, _, file_stat, _, _, parseable in batch:
+            # Files that won't be parsed only need a line count
+            if not (include_documentation and parseable):
+                lines = self._count_lines(file_path, file_stat)
+                results.append(None if lines is None else (lines, None))
+                continue
             
-            # Parse code structure if documentation is requested
+            content = self._read_file(file_path, file_stat)
+            if content is None:
+                results.append(None)
+                continue
+            
+            results.append((content.count(b'\n') + 1, content))
+        return results
+    
+    def _count_lines(self, file_path: str, file_stat: os.stat_result) -> Optional[int]:
+        """Count lines without allocating a bytes object per file; runs on the file pool"""
+        size = file_stat.st_size
+        
+        # Small files: a single read is cheaper than managing a buffer
+        if size < SMALL_FILE_SIZE:
+            content = self._read_file(file_path, file_stat)
+            return None if content is None else content.count(b'\n') + 1
+        
+        # Larger files are read into a per-thread buffer and counted in place
+        buffer = getattr(_line_buffers, 'buffer', None)
+        if buffer is None or len(buffer) < size:
+            buffer = _line_buffers.buffer = bytearray(max(size, 1024 * 1024))
+        try:
+            with open(file_path, 'rb', buffering=0) as f:
+                length = f.readinto(memoryview(buffer)[:size])
+        except OSError:
+            # If we can't read the file, skip it
+            return None
+        return buffer.count(b'\n', 0, length) + 1
+    
+    async def _analyze_file(self, relative_path: str, file_stat: os.stat_result, file_extension: str, language: str, lines: int, content: Optional[bytes]) -> FileInfo | None:
+        """Build a file's info, parsing its code structure when content was kept"""
+        try:
+            # Parse code structure for documentation
             documentation = None
-            if include_documentation and language in ['python', 'javascript']:
-                code_info = await self._parse_code_structure(content, language)
-                if code_info:
-                    documentation = self._generate_file_summary(code_info, relative_path, language)
+            code_info = None
+            if content is not None:
+                parsed = await self._parse_code_structure(content, language, relative_path)
+                if parsed:
+                    code_info, documentation = parsed
             
             return FileInfo(
                 path=relative_path,
                 type=file_extension,
-                size=file_size,
+                size=file_stat.st_size,
                 lines=lines,
                 language=language,
-                documentation=documentation
+                documentation=documentation,
+                code_structure=code_info
             )
             
         except Exception as e:
-            logger.warning(f"Error analyzing file {file_path}: {str(e)}")
+            logger.warning(f"Error analyzing file {relative_path}: {str(e)}")
             return None
     
-    async def _parse_code_structure(self, content: str, language: str) -> Optional[Dict[str, Any]]:
-        """Parse code structure using tree-sitter"""
-        try:
-            if language == 'python':
-                return self._parse_python_code(content)
-            elif language == 'javascript':
-                return self._parse_javascript_code(content)
-            return None
-        except Exception as e:
-            logger.warning(f"Error parsing {language} code: {str(e)}")
-            return None
-    
-    def _parse_python_code(self, content: str) -> Dict[str, Any]:
-        """Parse Python code structure"""
-        tree = self.python_parser.parse(bytes(content, 'utf-8'))
-        
-        classes = []
-        functions = []
-        imports = []
-        
-        def traverse_node(node: Node):
-            if node.type == 'class_definition':
-                class_name = self._get_node_text(node.child_by_field_name('name'), content)
-                methods = []
-                for child in node.children:
-                    if child.type == 'block':
-                        for stmt in child.children:
-                            if stmt.type == 'function_definition':
-                                method_name = self._get_node_text(stmt.child_by_field_name('name'), content)
-                                if method_name:
-                                    methods.append(method_name)
-                if class_name:
-                    classes.append({'name': class_name, 'methods': methods})
-            
-            elif node.type == 'function_definition':
-                # Only top-level functions (not methods)
-                if node.parent and node.parent.type != 'block' or (node.parent.parent and node.parent.parent.type != 'class_definition'):
-                    func_name = self._get_node_text(node.child_by_field_name('name'), content)
-                    if func_name:
-                        functions.append(func_name)
-            
-            elif node.type in ['import_statement', 'import_from_statement']:
-                import_text = self._get_node_text(node, content)
-                if import_text:
-                    imports.append(import_text.strip())
-            
-            for child in node.children:
-                traverse_node(child)
-        
-        traverse_node(tree.root_node)
-        
-        return {
-            'classes': classes,
-            'functions': functions,
-            'imports': imports
-        }
+    async def _parse_code_structure(self, content: bytes, language: str, file_path: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """Parse code structure and build its summary using tree-sitter on the parse pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._parse_pool, _parse_source, content, language, file_path, self._tree_cache)
     
-    def _parse_javascript_code(self, content: str) -> Dict[str, Any]:
-        """Parse JavaScript code structure"""
-        tree = self.js_parser.parse(bytes(content, 'utf-8'))
-        
-        classes = []
-        functions = []
-        imports = []
-        
-        def traverse_node(node: Node):
-            if node.type == 'class_declaration':
-                class_name = self._get_node_text(node.child_by_field_name('name'), content)
-                methods = []
-                for child in node.children:
-                    if child.type == 'class_body':
-                        for method in child.children:
-                            if method.type == 'method_definition':
-                                method_name = self._get_node_text(method.child_by_field_name('name'), content)
-                                if method_name:
-                                    methods.append(method_name)
-                if class_name:
-                    classes.append({'name': class_name, 'methods': methods})
-            
-            elif node.type == 'function_declaration':
-                func_name = self._get_node_text(node.child_by_field_name('name'), content)
-                if func_name:
-                    functions.append(func_name)
-            
-            elif node.type in ['import_statement', 'import_declaration']:
-                import_text = self._get_node_text(node, content)
-                if import_text:
-                    imports.append(import_text.strip())
-            
-            for child in node.children:
-                traverse_node(child)
-        
-        traverse_node(tree.root_node)
-        
-        return {
-            'classes': classes,
-            'functions': functions,
-            'imports': imports
-        }
-    
-    def _get_node_text(self, node: Optional[Node], content: str) -> Optional[str]:
-        """Extract text from a tree-sitter node"""
-        if not node:
-            return None
-        return content[node.start_byte:node.end_byte]
-    
-    def _generate_file_summary(self, code_info: Dict[str, Any], file_path: str, language: str) -> str:
-        """Generate a summary of the parsed code structure"""
-        summary_parts = [f"{language.title()} file: {file_path}"]
-        
-        if code_info.get('classes'):
-            summary_parts.append(f"Classes ({len(code_info['classes'])}): {', '.join([c['name'] for c in code_info['classes']])}")
-        
-        if code_info.get('functions'):
-            summary_parts.append(f"Functions ({len(code_info['functions'])}): {', '.join(code_info['functions'][:10])}{'...' if len(code_info['functions']) > 10 else ''}")
-        
-        if code_info.get('imports'):
-            summary_parts.append(f"Imports ({len(code_info['imports'])}): {'; '.join(code_info['imports'][:5])}{'...' if len(code_info['imports']) > 5 else ''}")
-        
-        return " | ".join(summary_parts)
-    
-    async def _extract_code_structure(self, files: List[FileInfo]) -> Dict[str, Any]:
-        """Extract overall code structure from all analyzed files"""
+    def _extract_code_structure(self, files: List[FileInfo]) -> Dict[str, Any]:
+        """Aggregate the parsed code structure of all analyzed files"""
         all_classes = []
         all_functions = []
         all_imports = set()
         
         for file_info in files:
-            if file_info.documentation and file_info.language in ['python', 'javascript']:
-                # Parse the documentation to extract structure info
-                # This is a simplified approach - in a real implementation, we'd store the parsed structure
-                if 'Classes' in file_info.documentation:
-                    # Extract class info from documentation
-                    classes_part = file_info.documentation.split('Classes')[1].split('|')[0] if 'Classes' in file_info.documentation else ""
-                    if classes_part:
-                        class_names = classes_part.split(':')[1].strip() if ':' in classes_part else ""
-                        if class_names:
-                            all_classes.extend([{'name': name.strip(), 'file': file_info.path} for name in class_names.split(', ') if name.strip()])
+            code_structure = file_info.code_structure
+            if not code_structure:
+                continue
+            all_classes.extend({'name': cls['name'], 'file': file_info.path} for cls in code_structure['classes'])
+            all_functions.extend(code_structure['functions'])
+            all_imports.update(code_structure['imports'])
         
         return {
             'total_classes': len(all_classes),
             'total_functions': len(all_functions),
             'total_imports': len(all_imports),
             'classes_by_file': all_classes
-        }
\ No newline at end of file
+        }
+
+# Analyzer owned by the current worker process, built on first use
+_process_analyzer: Optional[CodebaseAnalyzer] = None
+
+def analyze_codebase_sync(request: CodebaseAnalysisRequest) -> Dict[str, Any]:
+    """Run a full analysis to completion; entry point for process-pool workers"""
+    global _process_analyzer
+    
+    # Reuse one analyzer per process so its pools and parse-tree cache persist across analyses
+    if _process_analyzer is None:
+        _process_analyzer = CodebaseAnalyzer()
+    return asyncio.run(_process_analyzer.analyze_codebase(request))
@@ -0,0 +1,38 @@
+import os
+import hashlib
+from typing import Optional
+from app.utils.sqlite_cache import SQLiteTTLCache
+
+# Bump whenever prompt templates change so stale completions are not served
+PROMPT_VERSION = "v1"
+
+# Default time-to-live for cached completions (7 days)
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+
+class LLMCache:
+    """Exact-match cache for LLM completions backed by SQLite"""
+
+    def __init__(self, db_path: Optional[str] = None, ttl_seconds: Optional[int] = None):
+        self._store = SQLiteTTLCache(
+            db_path or os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite3"),
+            "llm_completions",
+            ttl_seconds or int(os.getenv("LLM_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+            "LLM cache"
+        )
+
+    @staticmethod
+    def _input_hash(prompt: str, model: str, temperature: float) -> str:
+        """Hash the inputs that determine a completion"""
+        return hashlib.sha256((model + str(temperature) + PROMPT_VERSION + prompt).encode()).hexdigest()
+
+    async def get(self, prompt: str, model: str, temperature: float) -> Optional[str]:
+        """Return a cached completion, or None on miss or expiry"""
+        return await self._store.get(self._input_hash(prompt, model, temperature))
+
+    async def put(self, prompt: str, model: str, temperature: float, response: str) -> None:
+        """Store a completion for later reuse"""
+        await self._store.put(self._input_hash(prompt, model, temperature), response)
+
+    async def discard(self, prompt: str, model: str, temperature: float) -> None:
+        """Remove a cached completion, e.g. when it turned out to be unusable"""
+        await self._store.discard(self._input_hash(prompt, model, temperature))
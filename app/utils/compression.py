@@ -0,0 +1,25 @@
+import threading
+import zstandard
+
+# Fast level with most of the ratio on text-heavy JSON
+ZSTD_LEVEL = 3
+
+# Every zstd frame starts with this magic number; plain JSON never does
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Compression contexts are not safe to share between threads
+_contexts = threading.local()
+
+def compress_json(payload: bytes) -> bytes:
+    """Compress a serialized JSON payload for storage"""
+    if not hasattr(_contexts, "compressor"):
+        _contexts.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    return _contexts.compressor.compress(payload)
+
+def decompress_json(raw: bytes) -> bytes:
+    """Restore a stored payload; values written before compression pass through unchanged"""
+    if not raw.startswith(ZSTD_MAGIC):
+        return raw
+    if not hasattr(_contexts, "decompressor"):
+        _contexts.decompressor = zstandard.ZstdDecompressor()
+    return _contexts.decompressor.decompress(raw)
@@ -1,25 +1,83 @@
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 from datetime import datetime
 
-def setup_logger(name: str) -> logging.Logger:
-    """Set up logger with consistent formatting"""
-    logger = logging.getLogger(name)
-    
-    if logger.handlers:
-        return logger
-    
-    logger.setLevel(logging.INFO)
-    
+# Shared queue drained by a single background listener that does the actual writes
+_log_queue = queue.SimpleQueue()
+_listener = None
+
+# Loggers set up by setup_logger, so configure_worker_logging can re-point them
+_loggers = []
+
+# Set in analysis pool workers, which write records directly
+_direct = False
+
+def _console_handler() -> logging.Handler:
+    """Handler writing formatted records to stdout"""
     # Create console handler
     handler = logging.StreamHandler(sys.stdout)
     handler.setLevel(logging.INFO)
-    
+
     # Create formatter
     formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
     handler.setFormatter(formatter)
-    
-    logger.addHandler(handler)
-    return logger
\ No newline at end of file
+    return handler
+
+def _start_listener() -> None:
+    """Start the background listener writing queued records to stdout"""
+    global _listener
+
+    _listener = logging.handlers.QueueListener(_log_queue, _console_handler(), respect_handler_level=True)
+    _listener.start()
+
+    # Flush anything still queued on interpreter shutdown
+    atexit.register(_listener.stop)
+
+def setup_logger(name: str) -> logging.Logger:
+    """Set up logger with consistent formatting"""
+    logger = logging.getLogger(name)
+
+    if logger.handlers:
+        return logger
+
+    logger.setLevel(logging.INFO)
+
+    _loggers.append(logger)
+
+    if _direct:
+        logger.addHandler(_console_handler())
+        return logger
+
+    if _listener is None:
+        _start_listener()
+
+    # Enqueue records; the listener thread formats and writes them
+    logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+    return logger
+
+def configure_worker_logging() -> None:
+    """Process pool initializer: write records directly instead of through the listener thread.
+
+    Analysis workers run off the event loop already, and records written
+    synchronously are not lost if the pool terminates the worker.
+    """
+    global _direct, _listener
+    _direct = True
+
+    # Loggers created while the worker imported its modules still point at the queue
+    handler = _console_handler()
+    for logger in _loggers:
+        for queue_handler in [h for h in logger.handlers if isinstance(h, logging.handlers.QueueHandler)]:
+            logger.removeHandler(queue_handler)
+        logger.addHandler(handler)
+
+    # Drain and stop the listener started during those imports
+    if _listener is not None:
+        _listener.stop()
+        atexit.unregister(_listener.stop)
+        _listener = None
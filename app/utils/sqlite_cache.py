@@ -0,0 +1,108 @@
+import time
+import asyncio
+import sqlite3
+import threading
+from typing import Optional
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# How often writes also sweep out expired entries
+PURGE_INTERVAL_SECONDS = 60 * 60
+
+class SQLiteTTLCache:
+    """String key/value table in SQLite whose entries expire ttl_seconds after they are written"""
+
+    def __init__(self, db_path: str, table: str, ttl_seconds: int, label: str):
+        self.db_path = db_path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        # Names the cache in log messages
+        self.label = label
+
+        # A single connection shared across threads, serialized by a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+
+        # Expired rows are only removed when read, so sweep the rest on startup and periodically
+        self._last_purge = 0.0
+        self._purge_expired()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return the stored value, or None on miss or expiry"""
+        # SQLite calls block, so they run on a worker thread rather than the event loop
+        return await asyncio.to_thread(self._get, key)
+
+    async def put(self, key: str, value: str) -> None:
+        """Store a value, replacing any previous one"""
+        await asyncio.to_thread(self._put, key, value)
+
+    async def discard(self, key: str) -> None:
+        """Remove a value, e.g. when it turned out to be unusable"""
+        await asyncio.to_thread(self._discard, key)
+
+    def _get(self, key: str) -> Optional[str]:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    f"SELECT value, expires_at FROM {self.table} WHERE key = ?",
+                    (key,)
+                ).fetchone()
+                if row and row[1] <= time.time():
+                    self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                    self._conn.commit()
+                    row = None
+        except sqlite3.Error as e:
+            logger.warning(f"{self.label} read failed: {str(e)}")
+            return None
+
+        return row[0] if row else None
+
+    def _put(self, key: str, value: str) -> None:
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?)",
+                    (key, value, now, now + self.ttl_seconds)
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"{self.label} write failed: {str(e)}")
+
+        if now - self._last_purge >= PURGE_INTERVAL_SECONDS:
+            self._purge_expired()
+
+    def _discard(self, key: str) -> None:
+        try:
+            with self._lock:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"{self.label} delete failed: {str(e)}")
+
+    def _purge_expired(self) -> None:
+        """Delete every expired entry"""
+        now = time.time()
+        self._last_purge = now
+        try:
+            with self._lock:
+                deleted = self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,)).rowcount
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"{self.label} purge failed: {str(e)}")
+            return
+        if deleted:
+            logger.info(f"Purged {deleted} expired {self.label} entries")
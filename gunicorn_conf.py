@@ -0,0 +1,25 @@
+import os
+import multiprocessing
+
+# Production entry point: gunicorn -c gunicorn_conf.py main:app
+
+cpu_count = multiprocessing.cpu_count()
+
+# Workers only share analyses through Redis; with in-process state a status poll
+# landing on another worker would not find the analysis, so stay on one worker
+default_workers = cpu_count * 2 if os.getenv("REDIS_URL") else 1
+workers = int(os.getenv("WEB_CONCURRENCY", default_workers))
+
+# Maintained successor to uvicorn.workers; picks up uvloop and httptools when installed
+worker_class = "uvicorn_worker.UvicornWorker"
+keepalive = 5
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+# Import the app in each worker after forking; importing it starts the logging
+# listener thread, which would not survive a fork from a preloaded master
+preload_app = False
+
+# Each worker starts its own analysis process pool; split the CPUs between them
+# instead of letting every worker spawn one process per CPU
+os.environ.setdefault("ANALYSIS_PROCESSES", str(max(1, cpu_count // workers)))
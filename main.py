@@ -1,42 +1,160 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel, HttpUrl
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator
 import uvicorn
 import os
+import sys
 import asyncio
-from datetime import datetime
+from datetime import datetime, timezone
 import uuid
+import time
+import orjson
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
 
 # Import our custom modules
 from app.models.request_models import CodebaseAnalysisRequest, AnalysisResponse
-from app.services.codebase_analyzer import CodebaseAnalyzer
-from app.services.ai_documentation_service import AIDocumentationService
-from app.utils.logger import setup_logger
+from app.services.codebase_analyzer import analyze_codebase_sync, get_source_revision
+from app.services.ai_documentation_service import AIDocumentationService, create_llm_http_client, ensure_tokenizer, track_fallbacks
+from app.services.analysis_cache import analysis_cache_key, create_analysis_cache
+from app.services.analysis_store import CoalescingStatusWriter, create_analysis_store
+from app.utils.logger import configure_worker_logging, setup_logger
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Configure the event loop and build the services before serving requests"""
+    # Blocking work offloaded to threads shares the default executor; the stock
+    # size (min(32, cpus + 4)) queues concurrent analyses behind each other
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=int(os.getenv("THREAD_POOL_SIZE", "64"))))
+    
+    # Scanning and parsing are CPU-bound, so analyses run in separate processes to keep
+    # the event loop responsive; spawn avoids forking a process with live threads
+    app.state.analysis_pool = ProcessPoolExecutor(
+        max_workers=int(os.getenv("ANALYSIS_PROCESSES", os.cpu_count() or 1)),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=configure_worker_logging
+    )
+    
+    # Services are built inside the running loop so the LLM client's connection pool
+    # belongs to it and is reused by every analysis; building them here rather than at
+    # import also keeps them out of the analysis processes, which re-import this module
+    app.state.ai_doc_service = AIDocumentationService(http_client=create_llm_http_client())
+    app.state.analysis_cache = create_analysis_cache()
+    # Analysis status and results; Redis when REDIS_URL is set so every worker shares them
+    app.state.analysis_store = create_analysis_store()
+    
+    # The prompt tokenizer may need a download; load it on a thread, and don't hold
+    # startup hostage to a slow network (the load finishes in the background)
+    try:
+        await asyncio.wait_for(ensure_tokenizer(), timeout=30)
+    except asyncio.TimeoutError:
+        logger.warning("Tokenizer still loading; estimating prompt tokens until it is ready")
+    try:
+        yield
+    finally:
+        await app.state.ai_doc_service.aclose()
+        app.state.analysis_pool.shutdown(wait=False, cancel_futures=True)
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Codebase Documentation Generator",
     description="AI-powered codebase analysis and documentation generation with sequence and class diagrams",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Configure CORS from a comma-separated allow-list; set it empty when a reverse
+# proxy handles CORS so the middleware is skipped entirely
+cors_origins = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "*").split(",") if origin.strip()]
+if cors_origins:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=cors_origins,
+        # Credentialed requests are only safe with explicit origins, never the wildcard
+        allow_credentials="*" not in cors_origins,
+        allow_methods=["GET", "POST"],
+        allow_headers=["*"],
+    )
+
+# Analysis results are large, highly compressible JSON; small status payloads are left alone
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 # Initialize services
 logger = setup_logger(__name__)
-codebase_analyzer = CodebaseAnalyzer()
-ai_doc_service = AIDocumentationService()
 
-# In-memory storage for analysis results (in production, use a database)
-analysis_results = {}
+# Bytes buffered before each chunk of a streamed result is sent
+RESULT_CHUNK_SIZE = 64 * 1024
+
+# Longest a status long-poll may hold a request open
+MAX_STATUS_WAIT_SECONDS = 60
+
+def new_analysis_id() -> str:
+    """Time-ordered UUIDv7 (RFC 9562), so ids and their store keys sort by creation time"""
+    timestamp_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")
+    value = (
+        (timestamp_ms & ((1 << 48) - 1)) << 80  # 48-bit Unix time in milliseconds
+        | 0x7 << 76                              # version 7
+        | (rand >> 68) << 64                     # 12 random bits
+        | 0b10 << 62                             # RFC 4122 variant
+        | (rand & ((1 << 62) - 1))               # 62 random bits
+    )
+    return str(uuid.UUID(int=value))
+
+def now_iso() -> str:
+    """Current time as an ISO 8601 UTC timestamp for status records"""
+    # An explicit UTC zone skips the local timezone lookup and keeps timestamps unambiguous across workers
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+async def build_status(analysis_id: str) -> Optional[Dict[str, Any]]:
+    """Build the public status payload for an analysis, or None if it is unknown"""
+    result = await app.state.analysis_store.get_status(analysis_id)
+    if result is None:
+        return None
+    return {
+        "analysis_id": analysis_id,
+        "status": result["status"],
+        "progress": result.get("progress", 0),
+        "message": result.get("message", ""),
+        "error": result.get("error"),
+        "partial_overview": result.get("partial_overview"),
+        "started_at": result.get("started_at"),
+        "completed_at": result.get("completed_at")
+    }
+
+async def iter_result_json(data: AnalysisResponse) -> AsyncIterator[bytes]:
+    """Serialize an analysis result as JSON in chunks, one file entry at a time"""
+    structure = data.file_structure
+    pieces = [
+        data.model_dump_json(exclude={"file_structure", "file_documentation"}).encode()[:-1],
+        b',"file_structure":',
+        structure.model_dump_json(exclude={"files"}).encode()[:-1],
+        b',"files":['
+    ]
+    size = sum(len(piece) for piece in pieces)
+    
+    def entries():
+        # Both large collections are emitted entry by entry, with their closing brackets
+        for index, file_info in enumerate(structure.files):
+            yield (b"," if index else b"") + file_info.model_dump_json().encode()
+        yield b']},"file_documentation":{'
+        for index, (path, doc) in enumerate(data.file_documentation.items()):
+            yield (b"," if index else b"") + orjson.dumps({path: doc})[1:-1]
+        yield b"}}"
+    
+    for piece in entries():
+        pieces.append(piece)
+        size += len(piece)
+        if size >= RESULT_CHUNK_SIZE:
+            yield b"".join(pieces)
+            pieces, size = [], 0
+    yield b"".join(pieces)
 
 @app.get("/")
 async def root():
@@ -47,6 +165,7 @@ async def root():
         "endpoints": {
             "analyze": "/analyze",
             "status": "/analysis/{analysis_id}/status",
+            "status_ws": "/analysis/{analysis_id}/ws",
             "result": "/analysis/{analysis_id}/result"
         }
     }
@@ -58,15 +177,15 @@ async def start_analysis(
 ):
     """Start codebase analysis"""
     try:
-        analysis_id = str(uuid.uuid4())
+        analysis_id = new_analysis_id()
         
         # Initialize analysis result
-        analysis_results[analysis_id] = {
+        await app.state.analysis_store.set_status(analysis_id, {
             "status": "processing",
-            "started_at": datetime.now().isoformat(),
+            "started_at": now_iso(),
             "progress": 0,
             "message": "Analysis started"
-        }
+        })
         
         # Start background analysis task
         background_tasks.add_task(
@@ -88,85 +207,184 @@ async def start_analysis(
         raise HTTPException(status_code=500, detail=f"Failed to start analysis: {str(e)}")
 
 @app.get("/analysis/{analysis_id}/status")
-async def get_analysis_status(analysis_id: str):
-    """Get analysis status"""
-    if analysis_id not in analysis_results:
-        raise HTTPException(status_code=404, detail="Analysis not found")
+async def get_analysis_status(
+    analysis_id: str,
+    wait: float = Query(0, ge=0, le=MAX_STATUS_WAIT_SECONDS),
+    since_progress: Optional[int] = None
+):
+    """Get analysis status.
     
-    result = analysis_results[analysis_id]
-    return {
-        "analysis_id": analysis_id,
-        "status": result["status"],
-        "progress": result.get("progress", 0),
-        "message": result.get("message", ""),
-        "started_at": result.get("started_at"),
-        "completed_at": result.get("completed_at")
-    }
+    With wait and since_progress this is a long-poll: while the analysis is still
+    processing at since_progress, the request is held until progress changes or
+    wait seconds pass, then the current status is returned either way.
+    """
+    if not wait or since_progress is None:
+        status = await build_status(analysis_id)
+        if status is None:
+            raise HTTPException(status_code=404, detail="Analysis not found")
+        return status
+    
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    # Subscribe before reading so a change between the read and the wait still wakes us
+    async with app.state.analysis_store.subscribe(analysis_id) as updates:
+        while True:
+            status = await build_status(analysis_id)
+            if status is None:
+                raise HTTPException(status_code=404, detail="Analysis not found")
+            if status["status"] != "processing" or status["progress"] != since_progress:
+                return status
+            remaining = deadline - loop.time()
+            if remaining <= 0 or not await updates.wait(timeout=remaining):
+                return status
+
+@app.websocket("/analysis/{analysis_id}/ws")
+async def analysis_status_ws(websocket: WebSocket, analysis_id: str):
+    """Push analysis status to the client on every state change"""
+    await websocket.accept()
+    try:
+        # Subscribe before the first snapshot so no update can slip in between
+        async with app.state.analysis_store.subscribe(analysis_id) as updates:
+            while True:
+                status = await build_status(analysis_id)
+                if status is None:
+                    await websocket.close(code=4404, reason="Analysis not found")
+                    return
+                # send_json would go through the stdlib encoder; keep the push path on orjson
+                await websocket.send_text(orjson.dumps(status).decode())
+                if status["status"] != "processing":
+                    break
+                # On timeout the current state is simply resent as a keep-alive
+                await updates.wait(timeout=30)
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info(f"Status subscriber for analysis {analysis_id} disconnected")
 
 @app.get("/analysis/{analysis_id}/result", response_model=AnalysisResponse)
 async def get_analysis_result(analysis_id: str):
     """Get analysis results"""
-    if analysis_id not in analysis_results:
+    result = await app.state.analysis_store.get_status(analysis_id)
+    if result is None:
         raise HTTPException(status_code=404, detail="Analysis not found")
     
-    result = analysis_results[analysis_id]
-    
     if result["status"] == "processing":
         raise HTTPException(status_code=202, detail="Analysis still in progress")
     elif result["status"] == "failed":
         raise HTTPException(status_code=500, detail=result.get("error", "Analysis failed"))
     
-    return result["data"]
+    data = await app.state.analysis_store.get_result(analysis_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Analysis result expired")
+    # Stream the JSON so the full payload is never buffered alongside the model
+    return StreamingResponse(iter_result_json(data), media_type="application/json")
 
 async def perform_analysis(analysis_id: str, request: CodebaseAnalysisRequest):
-    """Background task to perform codebase analysis"""
+    """Background task to perform codebase analysis, serving repeats from the analysis cache"""
+    # Progress is written in batches; each write is a store round trip and a subscriber wakeup
+    progress = CoalescingStatusWriter(app.state.analysis_store, analysis_id)
     try:
         # Update progress
-        analysis_results[analysis_id]["progress"] = 10
-        analysis_results[analysis_id]["message"] = "Initializing analysis..."
+        progress.update(progress=10, message="Initializing analysis...")
         
-        # Step 1: Get codebase structure
-        analysis_results[analysis_id]["progress"] = 20
-        analysis_results[analysis_id]["message"] = "Analyzing codebase structure..."
+        # Repeat analyses of the same revision with the same options are served from the cache
+        cache_key = None
+        revision = await get_source_revision(request)
+        if revision:
+            cache_key = analysis_cache_key(request, revision)
+            cached = await app.state.analysis_cache.get(cache_key)
+            if cached:
+                await progress.flush()
+                await app.state.analysis_store.complete(
+                    analysis_id,
+                    AnalysisResponse.model_validate_json(cached).model_copy(update={"analysis_id": analysis_id}),
+                    status="completed",
+                    completed_at=now_iso(),
+                    progress=100,
+                    message="Analysis completed successfully (cached)"
+                )
+                logger.info(f"Analysis {analysis_id} served from cache for {request.source}@{revision}")
+                return
         
-        codebase_data = await codebase_analyzer.analyze_codebase(request)
+        # Step 1: Get codebase structure
+        progress.update(progress=20, message="Analyzing codebase structure...")
         
-        # Step 2: Generate documentation (conditional based on request)
-        documentation = {"overview": "", "files": {}}
-        if request.include_documentation:
-            analysis_results[analysis_id]["progress"] = 50
-            analysis_results[analysis_id]["message"] = "Generating AI documentation..."
-            documentation = await ai_doc_service.generate_documentation(codebase_data)
+        loop = asyncio.get_running_loop()
+        codebase_data = await loop.run_in_executor(app.state.analysis_pool, analyze_codebase_sync, request)
         
-        # Step 3: Generate diagrams (conditional based on request)
-        sequence_diagram = None
-        class_diagram = None
-        if request.include_diagrams:
-            analysis_results[analysis_id]["progress"] = 80
-            analysis_results[analysis_id]["message"] = "Creating sequence and class diagrams..."
-            sequence_diagram = await ai_doc_service.generate_sequence_diagram(codebase_data)
-            class_diagram = await ai_doc_service.generate_class_diagram(codebase_data)
+        # Step 2: Generate documentation and/or diagrams (conditional based on request);
+        # fallbacks are tracked so a degraded result is never cached
+        with track_fallbacks() as fallbacks:
+            documentation = {"overview": "", "files": {}}
+            sequence_diagram = None
+            class_diagram = None
+            if request.include_documentation and request.include_diagrams:
+                # Overview and both diagrams share one LLM request
+                progress.update(progress=50, message="Generating AI documentation and diagrams...")
+                generated = await app.state.ai_doc_service.generate_all(codebase_data)
+                documentation = {"overview": generated["overview"], "files": generated["files"]}
+                sequence_diagram = generated["sequence_diagram"]
+                class_diagram = generated["class_diagram"]
+            elif request.include_documentation:
+                progress.update(progress=50, message="Generating AI documentation...", partial_overview="")
+                partial_overview = []
+                
+                def join_overview() -> str:
+                    return "".join(partial_overview)
+                
+                def on_overview_delta(delta: str):
+                    # Expose the overview to status pollers while it is still streaming;
+                    # the text is joined once per written batch, not once per delta
+                    partial_overview.append(delta)
+                    progress.update(partial_overview=join_overview)
+                
+                documentation = await app.state.ai_doc_service.generate_documentation(codebase_data, on_overview_delta)
+            elif request.include_diagrams:
+                # Step 3: Generate diagrams (conditional based on request)
+                progress.update(progress=60, message="Creating sequence and class diagrams...")
+                finished = 0
+                
+                async def tracked(name: str, diagram):
+                    # Both diagrams are generated concurrently; report each as it lands
+                    nonlocal finished
+                    result = await diagram
+                    finished += 1
+                    progress.update(progress=60 + 15 * finished, message=f"Created {name} diagram")
+                    return result
+                
+                sequence_diagram, class_diagram = await asyncio.gather(
+                    tracked("sequence", app.state.ai_doc_service.generate_sequence_diagram(codebase_data)),
+                    tracked("class", app.state.ai_doc_service.generate_class_diagram(codebase_data))
+                )
         
-        # Complete analysis
-        analysis_results[analysis_id] = {
-            "status": "completed",
-            "started_at": analysis_results[analysis_id]["started_at"],
-            "completed_at": datetime.now().isoformat(),
-            "progress": 100,
-            "message": "Analysis completed successfully",
-            "data": AnalysisResponse(
-                analysis_id=analysis_id,
-                project_overview=documentation["overview"],
-                file_structure=codebase_data["structure"],
-                file_documentation=documentation["files"],
-                sequence_diagram=sequence_diagram,
-                class_diagram=class_diagram,
-                technologies_used=codebase_data["technologies"],
-                total_files=codebase_data["total_files"],
-                total_lines=codebase_data["total_lines"]
-            )
-        }
+        # Complete analysis: the result and the completed status land together,
+        # after any progress batch so it cannot overwrite the final state
+        await progress.flush()
+        data = AnalysisResponse(
+            analysis_id=analysis_id,
+            project_overview=documentation["overview"],
+            file_structure=codebase_data["structure"],
+            file_documentation=documentation["files"],
+            sequence_diagram=sequence_diagram,
+            class_diagram=class_diagram,
+            technologies_used=codebase_data["technologies"],
+            total_files=codebase_data["total_files"],
+            total_lines=codebase_data["total_lines"]
+        )
+        await app.state.analysis_store.complete(
+            analysis_id,
+            data,
+            status="completed",
+            completed_at=now_iso(),
+            progress=100,
+            message="Analysis completed successfully",
+            # The full overview is in the result now
+            partial_overview=None
+        )
         
+        if cache_key and not fallbacks:
+            await app.state.analysis_cache.put(cache_key, data.model_dump_json())
+        elif cache_key:
+            logger.warning(f"Not caching analysis {analysis_id}; fell back on: {', '.join(sorted(set(fallbacks)))}")
         logger.info(f"Analysis {analysis_id} completed successfully")
         print(sequence_diagram)
         print("----------------")
@@ -174,19 +392,26 @@ async def perform_analysis(analysis_id: str, request: CodebaseAnalysisRequest):
         
     except Exception as e:
         logger.error(f"Analysis {analysis_id} failed: {str(e)}")
-        analysis_results[analysis_id] = {
-            "status": "failed",
-            "started_at": analysis_results[analysis_id]["started_at"],
-            "completed_at": datetime.now().isoformat(),
-            "progress": 0,
-            "error": str(e)
-        }
+        await progress.flush()
+        await app.state.analysis_store.update_status(
+            analysis_id,
+            status="failed",
+            completed_at=now_iso(),
+            progress=0,
+            error=str(e)
+        )
 
 if __name__ == "__main__":
+    # Analysis state lives in this process, so run a single worker unless told otherwise;
+    # auto-reload is a development convenience and only works with one worker
+    workers = int(os.getenv("UVICORN_WORKERS", "1"))
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        reload=workers == 1 and os.getenv("UVICORN_RELOAD", "true").lower() == "true",
+        workers=workers,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
         log_level="info"
     )
\ No newline at end of file